@@ -10,6 +10,7 @@ import pandas as pd
 import plotly.graph_objects as go
 from plotly.subplots import make_subplots
 import argparse
+import logging
 import os
 import sys # For exiting on critical errors
 import json # For serializing data for dcc.Store
@@ -735,10 +736,14 @@ if __name__ == "__main__":
     # Dash specific arguments
     parser.add_argument("--host", default="127.0.0.1", help="Host address to run the Dash server on.")
     parser.add_argument("--port", default="8050", type=int, help="Port to run the Dash server on.")
+    parser.add_argument("--log-level", default="INFO", choices=['DEBUG', 'INFO', 'WARNING', 'ERROR'], help="Verbosity of data loading messages.")
 
 
     args = parser.parse_args()
 
+    # Configure logging once for the data loader (WARNING skips per-file INFO lines)
+    logging.basicConfig(level=args.log_level, format='%(levelname)s: %(message)s')
+
     # --- Prepare Filepaths Dictionary ---
     csv_files = {
         'ATT': args.att_csv,
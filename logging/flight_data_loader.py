@@ -3,8 +3,12 @@
 import pandas as pd
 import sys
 import os
+import logging
+import math
 import numpy as np
 
+logger = logging.getLogger(__name__)
+
 # --- Constants and Column Definitions ---
 MIN_ROWS_THRESHOLD = 2 # Minimum number of rows to consider a CSV useful
 
@@ -45,16 +49,18 @@ OPTIONAL_COLS_TO_SELECT = {
 # --- Helper Function for Loading Data ---
 def load_and_prepare_csv(filepath, msg_type, required_cols=None, optional_cols_select=None):
     """Loads a single CSV, prepares timestamp, checks minimum rows and required columns."""
-    print(f"Reading {msg_type} data from: {filepath}")
+    logger.debug("Reading %s data from: %s", msg_type, filepath)
+    notes = [] # Per-file warnings, emitted as a single log record at the end
     try:
-        df = pd.read_csv(filepath)
+        # Memory-map local files so the parser reads straight from the page cache
+        df = pd.read_csv(filepath, memory_map=os.path.isfile(filepath))
         if df.empty:
-            print(f"Warning: CSV file is empty: {filepath}. Skipping.")
+            notes.append(f"CSV file is empty: {filepath}. Skipping.")
             return None
 
         # Timestamp handling
         if 'timestamp' not in df.columns:
-            print(f"Warning: Missing 'timestamp' column in {filepath}. Skipping.")
+            notes.append(f"Missing 'timestamp' column in {filepath}. Skipping.")
             return None
         # Try multiple formats for timestamp parsing
         try:
@@ -65,7 +71,7 @@ def load_and_prepare_csv(filepath, msg_type, required_cols=None, optional_cols_s
                 # Try with explicit format if the first fails (e.g., from different logging versions)
                 df['timestamp'] = pd.to_datetime(df['timestamp'], format='ISO8601', errors='coerce')
             except Exception as e_fmt:
-                 print(f"Warning: Could not parse timestamp in {filepath} with standard or ISO8601 format: {e_fmt}. Attempting numeric conversion.")
+                 notes.append(f"Could not parse timestamp in {filepath} with standard or ISO8601 format: {e_fmt}. Attempting numeric conversion.")
                  # Final attempt: Treat as numeric (e.g., microseconds since epoch) if conversion fails
                  df['timestamp'] = pd.to_datetime(df['timestamp'], unit='us', errors='coerce') # Common ArduPilot unit
 
@@ -73,81 +79,70 @@ def load_and_prepare_csv(filepath, msg_type, required_cols=None, optional_cols_s
         df.sort_values('timestamp', inplace=True)
 
         if len(df) < MIN_ROWS_THRESHOLD:
-            print(f"Warning: Found only {len(df)} {msg_type} data points (minimum {MIN_ROWS_THRESHOLD} required). Skipping.")
+            notes.append(f"Found only {len(df)} {msg_type} data points (minimum {MIN_ROWS_THRESHOLD} required). Skipping.")
             return None
 
         # Check required columns if specified
         if required_cols:
             missing = [col for col in required_cols if col not in df.columns]
             if missing:
-                print(f"Error: Missing required columns in {msg_type} CSV ({filepath}): {', '.join(missing)}")
+                logger.error("Missing required columns in %s CSV (%s): %s", msg_type, filepath, ', '.join(missing))
                 sys.exit(1) # Exit for required files
 
         # Select and rename optional columns if specified
         if optional_cols_select:
-            cols_to_use = list(optional_cols_select.keys())
-            present_cols = [col for col in cols_to_use if col in df.columns]
-            missing_optional = [col for col in cols_to_use if col not in df.columns]
+            cols_to_use = list(optional_cols_select)
+            # Build the column set once, then split the keys in O(k) membership tests
+            col_set = set(df.columns)
+            present_cols = [col for col in cols_to_use if col in col_set]
+            missing_optional = [col for col in cols_to_use if col not in col_set]
 
             if missing_optional:
-                print(f"Warning: Missing expected columns in {msg_type} CSV ({filepath}): {', '.join(missing_optional)}. Skipping these columns.")
+                notes.append(f"Missing expected columns in {msg_type} CSV ({filepath}): {', '.join(missing_optional)}. Skipping these columns.")
 
             if not present_cols:
-                 print(f"Warning: No usable data columns found in {msg_type} ({filepath}) after checking. Skipping file.")
+                 notes.append(f"No usable data columns found in {msg_type} ({filepath}) after checking. Skipping file.")
                  return None
 
             # Ensure timestamp is always included if present in the original file
-            if 'timestamp' in df.columns and 'timestamp' not in present_cols:
+            if 'timestamp' in col_set and 'timestamp' not in present_cols:
                 present_cols.insert(0, 'timestamp') # Add timestamp if missing from selection but present in file
 
             if 'timestamp' not in present_cols:
-                 print(f"Warning: Cannot proceed with {msg_type} ({filepath}) without timestamp. Skipping file.")
+                 notes.append(f"Cannot proceed with {msg_type} ({filepath}) without timestamp. Skipping file.")
                  return None
 
             # Create rename mapping only for present columns
-            rename_map = {k: v for k, v in optional_cols_select.items() if k in present_cols}
+            rename_map = {k: optional_cols_select[k] for k in present_cols}
             df = df[present_cols].rename(columns=rename_map)
 
 
-        print(f"Successfully loaded and prepared {len(df)} {msg_type} data points.")
+        logger.info("Successfully loaded and prepared %d %s data points.", len(df), msg_type)
         return df
 
     except FileNotFoundError:
         if required_cols:
-            print(f"Error: Required file not found at {filepath}")
+            logger.error("Required file not found at %s", filepath)
             sys.exit(1)
         else:
-            print(f"Info: Optional file not found at {filepath}. Skipping.")
+            logger.info("Optional file not found at %s. Skipping.", filepath)
             return None
     except pd.errors.EmptyDataError:
-        print(f"Warning: CSV file is empty: {filepath}. Skipping.")
+        notes.append(f"CSV file is empty: {filepath}. Skipping.")
         return None
     except Exception as e:
         if required_cols:
-            print(f"An unexpected error occurred while loading required file {filepath}: {e}")
+            logger.error("An unexpected error occurred while loading required file %s: %s", filepath, e)
             sys.exit(1)
         else:
-            print(f"Warning: An error occurred while loading optional file {filepath}: {e}. Skipping.")
+            notes.append(f"An error occurred while loading optional file {filepath}: {e}. Skipping.")
             return None
+    finally:
+        if notes:
+            logger.warning("%s: %s", msg_type, " ".join(notes))
 
 
 # --- Data Analysis Function ---
-def haversine(lat1, lon1, lat2, lon2):
-    """Calculate the great-circle distance between two points on Earth in meters."""
-    # Handle potential NaN inputs gracefully
-    if np.isnan(lat1) or np.isnan(lon1) or np.isnan(lat2) or np.isnan(lon2):
-        return np.nan
-    # Convert degrees to radians
-    lat1, lon1, lat2, lon2 = map(np.radians, [lat1, lon1, lat2, lon2])
-    # Haversine formula
-    dlat = lat2 - lat1
-    dlon = lon2 - lon1
-    a = np.sin(dlat/2)**2 + np.cos(lat1) * np.cos(lat2) * np.sin(dlon/2)**2
-    c = 2 * np.arcsin(np.sqrt(a))
-    # Earth's radius in meters (mean radius)
-    R = 6371000
-    return c * R
-
 def load_and_merge_data(csv_filepaths):
     """
     Loads required and optional flight data CSVs, calculates distance from home
@@ -157,20 +152,21 @@ def load_and_merge_data(csv_filepaths):
     dataframes = {}
     loaded_optional_types = []
 
-    print("Loading and preparing data...")
+    logger.info("Loading and preparing data...")
 
     # --- Load Required Data ---
     for msg_type in REQUIRED_COLS.keys():
         filepath = csv_filepaths.get(msg_type)
         if not filepath:
-            print(f"Error: Path for required data {msg_type} not provided.")
+            logger.error("Path for required data %s not provided.", msg_type)
             return None, []
         df = load_and_prepare_csv(filepath, msg_type, required_cols=REQUIRED_COLS[msg_type])
         if df is not None:
             # Ensure only required columns are kept initially
-            dataframes[msg_type] = df[REQUIRED_COLS[msg_type]].copy()
+            # No .copy() needed: the source df is discarded right after projection
+            dataframes[msg_type] = df.loc[:, REQUIRED_COLS[msg_type]]
         else:
-            print(f"Error: Failed to load required data {msg_type}. Cannot proceed.")
+            logger.error("Failed to load required data %s. Cannot proceed.", msg_type)
             return None, []
 
 
@@ -185,7 +181,7 @@ def load_and_merge_data(csv_filepaths):
                     dataframes[msg_type] = df
                     loaded_optional_types.append(msg_type)
                 else:
-                    print(f"Warning: No data columns loaded for optional type {msg_type} from {filepath}. Skipping.")
+                    logger.warning("No data columns loaded for optional type %s from %s. Skipping.", msg_type, filepath)
 
 
     # --- Calculate Distance from Home (New Section) ---
@@ -198,13 +194,17 @@ def load_and_merge_data(csv_filepaths):
         if first_valid_pos is not None:
             home_lat = first_valid_pos['POS_Lat']
             home_lng = first_valid_pos['POS_Lng']
-            print(f"Home position set from first valid POS: Lat={home_lat:.6f}, Lng={home_lng:.6f}")
-
-            # Apply haversine function row-wise
-            pos_df['Distance_From_Home'] = pos_df.apply(
-                lambda row: haversine(home_lat, home_lng, row['POS_Lat'], row['POS_Lng']),
-                axis=1
-            )
+            logger.info("Home position set from first valid POS: Lat=%.6f, Lng=%.6f", home_lat, home_lng)
+
+            # Vectorized haversine against the fixed home point; the home terms are
+            # constant for the whole frame so they are computed once. NaN rows stay NaN.
+            home_lat_r = math.radians(home_lat)
+            home_lng_r = math.radians(home_lng)
+            cos_home = math.cos(home_lat_r)
+            lat_r = np.radians(pos_df['POS_Lat'].to_numpy(dtype=np.float64))
+            lng_r = np.radians(pos_df['POS_Lng'].to_numpy(dtype=np.float64))
+            a = np.sin((lat_r - home_lat_r) * 0.5)**2 + cos_home * np.cos(lat_r) * np.sin((lng_r - home_lng_r) * 0.5)**2
+            pos_df['Distance_From_Home'] = 2 * 6371000 * np.arcsin(np.sqrt(a))
             # Ensure the new column is added back to the dictionary
             dataframes['POS'] = pos_df
             # Add 'Distance_From_Home' to the list of columns to keep if POS is loaded
@@ -213,25 +213,23 @@ def load_and_merge_data(csv_filepaths):
                  # We modify the dataframe in place, no need to change OPTIONAL_COLS_TO_SELECT
                  pass
         else:
-            print("Warning: POS data loaded, but no valid Lat/Lng found to set home position.")
+            logger.warning("POS data loaded, but no valid Lat/Lng found to set home position.")
     elif 'POS' in loaded_optional_types:
-         print("Warning: POS data loaded, but 'POS_Lat' or 'POS_Lng' columns are missing. Cannot calculate distance from home.")
+         logger.warning("POS data loaded, but 'POS_Lat' or 'POS_Lng' columns are missing. Cannot calculate distance from home.")
 
 
     # --- Print Loaded Types ---
-    print("-" * 20)
-    print(f"Loaded required types: {', '.join(REQUIRED_COLS.keys())}")
+    logger.info("Loaded required types: %s", ', '.join(REQUIRED_COLS.keys()))
     if loaded_optional_types:
-        print(f"Loaded optional types: {', '.join(loaded_optional_types)}")
+        logger.info("Loaded optional types: %s", ', '.join(loaded_optional_types))
     else:
-        print("No optional data types were successfully loaded.")
-    print("-" * 20)
+        logger.info("No optional data types were successfully loaded.")
 
 
     # --- Merge DataFrames ---
-    print("Merging dataframes based on timestamp...")
+    logger.info("Merging dataframes based on timestamp...")
     if 'ATT' not in dataframes:
-        print("Error: ATT data missing, cannot proceed with merge.")
+        logger.error("ATT data missing, cannot proceed with merge.")
         return None, loaded_optional_types # Return loaded types even on failure
 
     df_merged = dataframes['ATT'] # Start with ATT
@@ -243,17 +241,17 @@ def load_and_merge_data(csv_filepaths):
          # Use suffixes to avoid column name collisions if IMU had overlapping names (though unlikely here)
          df_merged = pd.merge_asof(df_merged, dataframes['IMU'], on='timestamp', direction='nearest', tolerance=tolerance, suffixes=('', '_IMU'))
     else:
-        print("Error: IMU data missing, cannot proceed with merge.")
+        logger.error("IMU data missing, cannot proceed with merge.")
         return None, loaded_optional_types # Return loaded types
 
     # Merge Optional Data
     for msg_type in loaded_optional_types:
         if msg_type in dataframes: # Double check df exists
-            print(f"Merging {msg_type}...")
+            logger.debug("Merging %s...", msg_type)
             # Use suffixes to prevent column name collisions, especially if multiple sources provide e.g., 'Alt'
             df_merged = pd.merge_asof(df_merged, dataframes[msg_type], on='timestamp', direction='nearest', tolerance=tolerance, suffixes=('', f'_{msg_type}'))
 
-    print("Finished merging.")
+    logger.info("Finished merging.")
 
 
     # --- Final Processing ---
@@ -271,24 +269,25 @@ def load_and_merge_data(csv_filepaths):
     df_merged.dropna(subset=essential_dropna_subset, how='any', inplace=True)
     post_drop_len = len(df_merged)
 
-    print(f"Original ATT points: {original_len}")
-    print(f"Merged dataframe size before essential dropna: {pre_drop_len}")
-    print(f"Merged dataframe size after essential dropna: {post_drop_len}")
+    logger.info("Original ATT points: %d, merged size before/after essential dropna: %d/%d",
+                original_len, pre_drop_len, post_drop_len)
 
     # Add a check for significant data loss during merge/drop
     if pre_drop_len > 0 and post_drop_len < pre_drop_len * 0.8: # Check if more than 20% lost in dropna
-        print(f"Warning: Significant data loss ({pre_drop_len - post_drop_len} rows) during essential dropna. Check data quality.")
+        logger.warning("Significant data loss (%d rows) during essential dropna. Check data quality.", pre_drop_len - post_drop_len)
     elif post_drop_len < original_len * 0.8: # Check if significant loss compared to original ATT
-         print(f"Warning: Significant data loss compared to original ATT points. Timestamps might be misaligned or merge tolerance too small.")
+         logger.warning("Significant data loss compared to original ATT points. Timestamps might be misaligned or merge tolerance too small.")
 
 
     if df_merged.empty:
-        print("Error: No valid merged data remaining after dropping essential NaNs.")
+        logger.error("No valid merged data remaining after dropping essential NaNs.")
         return None, loaded_optional_types
 
-    print(f"Proceeding with {len(df_merged)} data points.")
+    logger.info("Proceeding with %d data points.", len(df_merged))
     # Set index AFTER merge and dropna
     df_merged.set_index('timestamp', inplace=True)
-    df_merged.sort_index(inplace=True) # Ensure time order
+    # ATT is sorted on load and merge_asof keeps that order, so this sort rarely runs
+    if not df_merged.index.is_monotonic_increasing:
+        df_merged.sort_index(inplace=True) # Ensure time order
 
     return df_merged, loaded_optional_types 
\ No newline at end of file
@@ -1,23 +1,25 @@
 #!/usr/bin/env python3
 
 import pandas as pd
-import plotly.graph_objects as go
-from plotly.subplots import make_subplots
 import plotly.io as pio
 import imageio.v2 as iio
 import numpy as np
 import argparse
+import inspect
+import logging
+import math
 import os
-import sys
-import tempfile
 import shutil
+import subprocess
+import threading
+import sys
 from tqdm import tqdm # Progress bar
-from datetime import timedelta, datetime # Added datetime
 import concurrent.futures # Added for multiprocessing
-import gc # Added for potential garbage collection trigger
+import collections
+from multiprocessing import shared_memory
 
 # Import shared data loading functions
-from flight_data_loader import load_and_merge_data, REQUIRED_COLS, OPTIONAL_COLS_TO_SELECT
+from flight_data_loader import load_and_merge_data
 
 # --- Constants Specific to Video Generator ---
 
@@ -38,286 +40,553 @@ PLOT_DEFINITIONS = {
 # --- They are now imported from flight_data_loader ---
 
 
-# --- Frame Generation Function ---
-def create_frame_figure(df_window, current_time, loaded_optional_types, active_plots, log_identifier, stall_speed, width, height, window_duration_secs):
-    """Creates a Plotly figure for a single frame of the animation."""
-    if df_window is None or df_window.empty:
-        return None # Skip frame if no data
+# --- Downsampling ---
+def downsample_minmax(x_values, y_values, n_buckets):
+    """
+    Min/max decimation of one trace: keeps the lowest and highest sample of each
+    of n_buckets equal-count buckets (plus the first and last sample), so at most
+    ~2*n_buckets points survive while every visible peak is still drawn.
+    Returns the inputs unchanged when they are already short enough.
+    """
+    n = len(y_values)
+    if n <= 2 * n_buckets:
+        return x_values, y_values
+    k = -(-n // n_buckets) # Bucket size, ceil(n / n_buckets)
+    y = np.asarray(y_values, dtype=float)
+    pad = n_buckets * k - n
+    # NaNs (and the padding) can never win: +inf for the min search, -inf for the max search
+    lo_src = np.concatenate([np.where(np.isnan(y), np.inf, y), np.full(pad, np.inf)]).reshape(n_buckets, k)
+    hi_src = np.concatenate([np.where(np.isnan(y), -np.inf, y), np.full(pad, -np.inf)]).reshape(n_buckets, k)
+    offsets = np.arange(n_buckets) * k
+    keep = np.concatenate(([0, n - 1], offsets + lo_src.argmin(axis=1), offsets + hi_src.argmax(axis=1)))
+    keep = np.unique(keep[keep < n]) # Sorted, so the line is still drawn left to right
+    return x_values[keep], y_values[keep]
+
+
+def round_significant(values, digits=7):
+    """
+    Rounds values to about float32 precision (7 significant digits of the largest magnitude),
+    so their JSON repr is short. Casting to float32 would not help: Plotly writes the
+    float64 repr of each float32 value, e.g. 0.30000001192092896.
+    """
+    peak = np.fmax.reduce(np.abs(values)) if len(values) else np.nan # NaN-skipping max, no all-NaN warning
+    if not np.isfinite(peak) or peak == 0:
+        return values
+    return np.round(values, digits - 1 - int(math.floor(math.log10(peak))))
 
-    rcin_loaded = 'RCIN' in loaded_optional_types
-    bat_loaded = 'BAT' in loaded_optional_types # Check if BAT data is loaded
-    num_rows = len(active_plots)
-    if num_rows == 0:
-        return None
 
-    # Generate titles for active plots only
-    subplot_titles = []
-    plot_row_map = {} # Map plot key to its row index (1-based)
-    current_row = 1
-    specs = [] # Define specs for secondary y-axis
+def last_valid_indices(col_matrix):
+    """
+    For every row and column, the row index of the latest non-NaN value at or before
+    that row (-1 if none yet). Built once, so the latest valid value of each column in
+    a window is a single row lookup instead of a backwards scan per column per frame.
+    """
+    rows = np.arange(len(col_matrix))[:, None]
+    return np.maximum.accumulate(np.where(np.isnan(col_matrix), -1, rows), axis=0)
+
+
+# --- Plot Specs ---
+def build_plot_specs(active_plots, loaded_optional_types, columns):
+    """
+    Resolves which subplots and traces to draw, once per run, from the loaded types and
+    the available columns. Returns (plot_key, title, y_title, traces, no_data_text) for
+    each active plot in display order, each trace being
+    (col_name, trace_name, color, dash, trace_abbr, secondary_y).
+    Passed to the workers, where both renderers just loop over it, and used to pick
+    the columns shipped to them.
+    """
+    rcin_loaded = 'RCIN' in loaded_optional_types
+    plot_specs = []
     for plot_key in PLOT_DEFINITIONS: # Iterate in defined order
-        if plot_key in active_plots:
-            title = PLOT_DEFINITIONS[plot_key]
-            # Add specifics to titles based on loaded data (similar to dash app)
-            if plot_key == 'roll_ctrl' and rcin_loaded and 'RCIN_C1_Roll' in df_window.columns: title = 'Roll Ctrl (Rate vs Input)'
-            elif plot_key == 'roll_ctrl': title = 'Roll Ctrl (Rate)'
-            elif plot_key == 'pitch_ctrl' and rcin_loaded and 'RCIN_C2_Pitch' in df_window.columns: title = 'Pitch Ctrl (Rate vs Input)'
-            elif plot_key == 'pitch_ctrl': title = 'Pitch Ctrl (Rate)'
-            # Add more title refinements if needed
-
-            subplot_titles.append(title)
-            plot_row_map[plot_key] = current_row
-            # Add spec for secondary y-axis if this is the battery plot
-            specs.append([{"secondary_y": True}] if plot_key == 'battery' else [{"secondary_y": False}])
-            current_row += 1
-
-    fig = make_subplots(
-        rows=num_rows, cols=1,
-        shared_xaxes=True,
-        subplot_titles=subplot_titles,
-        vertical_spacing=0.05, # Adjust spacing for vertical layout
-        specs=specs # Add specs for secondary y-axes
-    )
-
-    # --- Add Traces Conditionally ---
-    # Get the data point closest to the current time for annotations
-    latest_data_point = df_window.iloc[-1] if not df_window.empty else None
-
-    # Helper to add trace and annotation
-    def add_trace_with_value(plot_key, row_idx, col_name, trace_name, color, dash=None, legend_group=None, show_legend=False, trace_abbr=None, secondary_y=False): # Added secondary_y
-        """Adds a trace and its value annotation."""
-        if col_name in df_window.columns:
-            # Plot the line segment for the current window
-            fig.add_trace(go.Scatter(x=df_window.index, y=df_window[col_name], name=trace_name, mode='lines',
-                                     line=dict(color=color, width=1.5, dash=dash), legendgroup=legend_group,
-                                     showlegend=show_legend), # Use the show_legend parameter (now defaults to False)
-                          row=row_idx, col=1, secondary_y=secondary_y) # Use secondary_y
-
-            # Add annotation for the current value
-            if latest_data_point is not None and pd.notna(latest_data_point[col_name]):
-                current_value = latest_data_point[col_name]
-                # Determine yref base for the primary axis of this subplot
-                yref_base = f"y{row_idx}" if row_idx > 1 else "y"
-
-                # Use abbreviation if provided, otherwise use trace_name
-                label = trace_abbr if trace_abbr else trace_name
-
-                # Position annotation to the right of the plot area, aligned with the value on the y-axis
-                fig.add_annotation(
-                    xref="paper",
-                    # Always reference the primary y-axis of the subplot for annotation positioning.
-                    # The 'y' value itself handles the vertical placement based on the data.
-                    yref=yref_base,
-                    x=1.02,
-                    y=current_value,
-                    # Update text to include value and label
-                    text=f"{current_value:.2f} {label}",
-                    showarrow=False,
-                    font=dict(color=color, size=10),
-                    bgcolor="rgba(255,255,255,0.7)",
-                    xanchor="left",
-                    yanchor="middle",
-                    align="left"
-                )
-            return True
-        return False
+        if plot_key not in active_plots:
+            continue
+        title = PLOT_DEFINITIONS[plot_key]
+        traces, y_title, no_data_text = [], None, None
+
+        if plot_key == 'roll_att':
+            traces = [('Roll', 'Actual', 'blue', None, 'Act', False), ('DesRoll', 'Desired', 'red', 'dash', 'Des', False)]
+            y_title = "Roll (deg)"
+        elif plot_key == 'roll_ctrl':
+            title, y_title = 'Roll Ctrl (Rate)', "Rate (deg/s)"
+            traces = [('GyrX', 'Roll Rate', 'green', None, 'Rate', False)]
+            if rcin_loaded and 'RCIN_C1_Roll' in columns:
+                title, y_title = 'Roll Ctrl (Rate vs Input)', "Rate/Input"
+                traces.append(('RCIN_C1_Roll', 'Pilot In', 'grey', 'dot', 'In', False))
+        elif plot_key == 'pitch_att':
+            traces = [('Pitch', 'Actual', 'blue', None, 'Act', False), ('DesPitch', 'Desired', 'red', 'dash', 'Des', False)]
+            y_title = "Pitch (deg)"
+        elif plot_key == 'pitch_ctrl':
+            title, y_title = 'Pitch Ctrl (Rate)', "Rate (deg/s)"
+            traces = [('GyrY', 'Pitch Rate', 'green', None, 'Rate', False)]
+            if rcin_loaded and 'RCIN_C2_Pitch' in columns:
+                title, y_title = 'Pitch Ctrl (Rate vs Input)', "Rate/Input"
+                traces.append(('RCIN_C2_Pitch', 'Pilot In', 'grey', 'dot', 'In', False))
+        elif plot_key == 'yaw_att':
+            traces = [('Yaw', 'Actual', 'blue', None, 'Act', False), ('DesYaw', 'Desired', 'red', 'dash', 'Des', False)]
+            y_title = "Yaw (deg)"
+        elif plot_key == 'alt_amsl':
+            if 'POS' in loaded_optional_types: traces.append(('POS_Alt_AMSL', 'Fused', 'purple', None, 'Fused', False))
+            if 'GPS' in loaded_optional_types: traces.append(('GPS_Alt_AMSL', 'GPS', 'orange', 'dot', 'GPS', False))
+            if 'BARO' in loaded_optional_types: traces.append(('BARO_Alt_Raw', 'Baro', 'brown', 'dashdot', 'Baro', False))
+            y_title, no_data_text = "Alt AMSL (m)", "No AMSL data"
+        elif plot_key == 'alt_agl':
+            if 'XKF5' in loaded_optional_types: traces.append(('XKF5_HAGL', 'Est HAGL', 'cyan', None, 'Est', False))
+            if 'POS' in loaded_optional_types:
+                if 'POS_RelHomeAlt_AGL' in columns: traces.append(('POS_RelHomeAlt_AGL', 'Rel Home', 'magenta', 'dash', 'Home', False))
+                elif 'POS_RelOriginAlt_AGL' in columns: traces.append(('POS_RelOriginAlt_AGL', 'Rel Origin', 'magenta', 'dash', 'Origin', False))
+            if 'RFND' in loaded_optional_types: traces.append(('RFND_Dist_AGL', 'Rangefinder', 'lime', 'dot', 'Rngfnd', False))
+            if 'TERR' in loaded_optional_types: traces.append(('TERR_CHeight_AGL', 'Terrain DB', 'gold', 'dashdot', 'TerrDB', False))
+            y_title, no_data_text = "Alt AGL (m)", "No AGL data"
+        elif plot_key == 'speed':
+            if 'ARSP' in loaded_optional_types: traces.append(('ARSP_Airspeed', 'Airspeed', 'teal', None, 'ASPD', False))
+            if 'GPS' in loaded_optional_types: traces.append(('GPS_Spd_Ground', 'Ground Spd', 'navy', 'dash', 'GSPD', False))
+            y_title, no_data_text = "Speed (m/s)", "No Speed data"
+        elif plot_key == 'battery':
+            bat_loaded = 'BAT' in loaded_optional_types
+            if bat_loaded:
+                traces = [('BAT_Volt', 'Voltage', 'goldenrod', None, 'V', False), ('BAT_Curr', 'Current', 'firebrick', None, 'A', True)]
+            y_title = "Volt (V) Curr (A)"
+            no_data_text = "No Battery data loaded" if not bat_loaded else "No Battery data in window"
 
-    # Plot 1: Roll Attitude
-    if 'roll_att' in plot_row_map:
-        row_idx = plot_row_map['roll_att']
-        # Provide short abbreviations (trace_abbr)
-        add_trace_with_value(plot_key='roll_att', row_idx=row_idx, col_name='Roll', trace_name='Actual', color='blue', trace_abbr='Act')
-        add_trace_with_value(plot_key='roll_att', row_idx=row_idx, col_name='DesRoll', trace_name='Desired', color='red', dash='dash', trace_abbr='Des')
-        fig.update_yaxes(title_text="Roll (deg)", row=row_idx, col=1)
-
-    # Plot 2: Roll Control
-    if 'roll_ctrl' in plot_row_map:
-        row_idx = plot_row_map['roll_ctrl']
-        y_title = "Rate (deg/s)"
-        add_trace_with_value(plot_key='roll_ctrl', row_idx=row_idx, col_name='GyrX', trace_name='Roll Rate', color='green', trace_abbr='Rate')
-        if rcin_loaded:
-            if add_trace_with_value(plot_key='roll_ctrl', row_idx=row_idx, col_name='RCIN_C1_Roll', trace_name='Pilot In', color='grey', dash='dot', trace_abbr='In'):
-                 y_title = "Rate/Input"
-        fig.update_yaxes(title_text=y_title, row=row_idx, col=1)
-
-    # Plot 3: Pitch Attitude
-    if 'pitch_att' in plot_row_map:
-        row_idx = plot_row_map['pitch_att']
-        add_trace_with_value(plot_key='pitch_att', row_idx=row_idx, col_name='Pitch', trace_name='Actual', color='blue', trace_abbr='Act')
-        add_trace_with_value(plot_key='pitch_att', row_idx=row_idx, col_name='DesPitch', trace_name='Desired', color='red', dash='dash', trace_abbr='Des')
-        fig.update_yaxes(title_text="Pitch (deg)", row=row_idx, col=1)
-
-    # Plot 4: Pitch Control
-    if 'pitch_ctrl' in plot_row_map:
-        row_idx = plot_row_map['pitch_ctrl']
-        y_title = "Rate (deg/s)"
-        add_trace_with_value(plot_key='pitch_ctrl', row_idx=row_idx, col_name='GyrY', trace_name='Pitch Rate', color='green', trace_abbr='Rate')
-        if rcin_loaded:
-            if add_trace_with_value(plot_key='pitch_ctrl', row_idx=row_idx, col_name='RCIN_C2_Pitch', trace_name='Pilot In', color='grey', dash='dot', trace_abbr='In'):
-                y_title = "Rate/Input"
-        fig.update_yaxes(title_text=y_title, row=row_idx, col=1)
-
-    # Plot 5: Yaw Attitude
-    if 'yaw_att' in plot_row_map:
-        row_idx = plot_row_map['yaw_att']
-        add_trace_with_value(plot_key='yaw_att', row_idx=row_idx, col_name='Yaw', trace_name='Actual', color='blue', trace_abbr='Act')
-        add_trace_with_value(plot_key='yaw_att', row_idx=row_idx, col_name='DesYaw', trace_name='Desired', color='red', dash='dash', trace_abbr='Des')
-        fig.update_yaxes(title_text="Yaw (deg)", row=row_idx, col=1)
-
-    # Plot 6: Altitude AMSL
-    if 'alt_amsl' in plot_row_map:
-        row_idx = plot_row_map['alt_amsl']
-        has_data = False
-        if 'POS' in loaded_optional_types: has_data |= add_trace_with_value(plot_key='alt_amsl', row_idx=row_idx, col_name='POS_Alt_AMSL', trace_name='Fused', color='purple', trace_abbr='Fused')
-        if 'GPS' in loaded_optional_types: has_data |= add_trace_with_value(plot_key='alt_amsl', row_idx=row_idx, col_name='GPS_Alt_AMSL', trace_name='GPS', color='orange', dash='dot', trace_abbr='GPS')
-        if 'BARO' in loaded_optional_types: has_data |= add_trace_with_value(plot_key='alt_amsl', row_idx=row_idx, col_name='BARO_Alt_Raw', trace_name='Baro', color='brown', dash='dashdot', trace_abbr='Baro')
-        if has_data: fig.update_yaxes(title_text="Alt AMSL (m)", row=row_idx, col=1)
-        else: fig.add_annotation(text="No AMSL data", xref="paper", yref="paper", x=0.5, y=0.5, showarrow=False, row=row_idx, col=1)
-
-    # Plot 7: Altitude AGL
-    if 'alt_agl' in plot_row_map:
-        row_idx = plot_row_map['alt_agl']
-        has_data = False
-        if 'XKF5' in loaded_optional_types: has_data |= add_trace_with_value(plot_key='alt_agl', row_idx=row_idx, col_name='XKF5_HAGL', trace_name='Est HAGL', color='cyan', trace_abbr='Est')
-        rel_alt_col, rel_alt_name, rel_alt_abbr = (None, None, None)
-        if 'POS' in loaded_optional_types:
-            if 'POS_RelHomeAlt_AGL' in df_window.columns: rel_alt_col, rel_alt_name, rel_alt_abbr = ('POS_RelHomeAlt_AGL', 'Rel Home', 'Home')
-            elif 'POS_RelOriginAlt_AGL' in df_window.columns: rel_alt_col, rel_alt_name, rel_alt_abbr = ('POS_RelOriginAlt_AGL', 'Rel Origin', 'Origin')
-            if rel_alt_col: has_data |= add_trace_with_value(plot_key='alt_agl', row_idx=row_idx, col_name=rel_alt_col, trace_name=rel_alt_name, color='magenta', dash='dash', trace_abbr=rel_alt_abbr)
-        if 'RFND' in loaded_optional_types: has_data |= add_trace_with_value(plot_key='alt_agl', row_idx=row_idx, col_name='RFND_Dist_AGL', trace_name='Rangefinder', color='lime', dash='dot', trace_abbr='Rngfnd')
-        if 'TERR' in loaded_optional_types: has_data |= add_trace_with_value(plot_key='alt_agl', row_idx=row_idx, col_name='TERR_CHeight_AGL', trace_name='Terrain DB', color='gold', dash='dashdot', trace_abbr='TerrDB')
-        if has_data: fig.update_yaxes(title_text="Alt AGL (m)", row=row_idx, col=1)
-        else: fig.add_annotation(text="No AGL data", xref="paper", yref="paper", x=0.5, y=0.5, showarrow=False, row=row_idx, col=1)
-
-    # Plot 8: Speed
-    if 'speed' in plot_row_map:
-        row_idx = plot_row_map['speed']
-        has_data = False
-        # Provide abbreviations: ASPD for Airspeed, GSPD for Ground Speed
-        if 'ARSP' in loaded_optional_types: has_data |= add_trace_with_value(plot_key='speed', row_idx=row_idx, col_name='ARSP_Airspeed', trace_name='Airspeed', color='teal', trace_abbr='ASPD')
-        if 'GPS' in loaded_optional_types: has_data |= add_trace_with_value(plot_key='speed', row_idx=row_idx, col_name='GPS_Spd_Ground', trace_name='Ground Spd', color='navy', dash='dash', trace_abbr='GSPD')
-
-        if has_data:
-            fig.update_yaxes(title_text="Speed (m/s)", row=row_idx, col=1)
-            # Add stall speed line if value is provided
-            if stall_speed is not None and isinstance(stall_speed, (int, float)) and stall_speed > 0:
-                 fig.add_shape(type="line",
-                              x0=df_window.index.min(), y0=stall_speed,
-                              x1=df_window.index.max(), y1=stall_speed,
-                              line=dict(color="OrangeRed", width=2, dash="dot"),
-                              row=row_idx, col=1)
-                 # Add annotation for stall speed next to the line
-                 fig.add_annotation(
-                    xref="paper", yref=f"y{row_idx}",
-                    x=1.02,
-                    y=stall_speed,
-                    # Update text format for consistency
-                    text=f"{stall_speed:.1f} Stall",
-                    showarrow=False,
-                    font=dict(color="OrangeRed", size=10),
-                    bgcolor="rgba(255,255,255,0.7)",
-                    xanchor="left",
-                    yanchor="middle",
-                    row=row_idx, col=1 # Explicitly specify row/col for annotation positioning relative to subplot
-                 )
-        else: fig.add_annotation(text="No Speed data", xref="paper", yref="paper", x=0.5, y=0.5, showarrow=False, row=row_idx, col=1)
-
-    # Plot 9: Battery Voltage & Current
-    if 'battery' in plot_row_map:
-        row_idx = plot_row_map['battery']
-        has_data = False
-        bat_loaded = 'BAT' in loaded_optional_types # Check if BAT data was loaded initially
-
-        if bat_loaded:
-            # Plot Voltage on primary y-axis
-            volt_added = add_trace_with_value(plot_key='battery', row_idx=row_idx, col_name='BAT_Volt', trace_name='Voltage', color='goldenrod', trace_abbr='V', secondary_y=False)
-            # Plot Current on secondary y-axis
-            curr_added = add_trace_with_value(plot_key='battery', row_idx=row_idx, col_name='BAT_Curr', trace_name='Current', color='firebrick', trace_abbr='A', secondary_y=True)
-            has_data = volt_added or curr_added
-
-        if has_data:
-            # Update y-axis titles for this subplot
-            fig.update_yaxes(title_text="Volt (V) Curr (A)", row=row_idx, col=1, secondary_y=False)
-            # fig.update_yaxes(title_text="Current (A)", row=row_idx, col=1, secondary_y=True, showgrid=False) # Optionally hide grid for secondary
+        traces = [trace for trace in traces if trace[0] in columns]
+        if traces:
+            no_data_text = None
         else:
-            # Add annotation if plot is selected but no data exists *for this window*
-            # Check if BAT was loaded at all to differentiate between no data loaded vs no data in window
-            no_data_text = "No Battery data loaded" if not bat_loaded else "No Battery data in window"
-            fig.add_annotation(text=no_data_text, xref="paper", yref="paper", x=0.5, y=0.5, showarrow=False, row=row_idx, col=1)
-            # Hide secondary y-axis if no data
-            fig.update_yaxes(visible=False, secondary_y=True, row=row_idx, col=1)
+            y_title = None
+        plot_specs.append((plot_key, title, y_title, traces, no_data_text))
+    return plot_specs
 
 
-    # --- Update Layout ---
+# --- Frame Generation Function ---
+def _scatter_dict(name, color, dash, xaxis, yaxis):
+    """
+    Plain-dict equivalent of go.Scatter(mode='lines') without x/y, skips Plotly's
+    property validation. Frames fill in the data with dict(base, x=..., y=...).
+    """
+    line = {'color': color, 'width': 1.5}
+    if dash:
+        line['dash'] = dash
+    return {'type': 'scatter', 'name': name, 'mode': 'lines', 'line': line,
+            'showlegend': False, 'xaxis': xaxis, 'yaxis': yaxis}
+
+
+def build_plotly_template(plot_specs, stall_speed, width, height):
+    """
+    Builds the frame-independent part of the Plotly figure once per worker: the
+    make_subplots(shared_xaxes=True) grid, axis titles, subplot titles and other
+    static annotations. Returns a dict with the base 'layout' and, per row, prebuilt
+    trace/label/shape dicts that create_frame_figure only copies and fills with data.
+    """
+    num_rows = len(plot_specs)
+    # Same geometry as make_subplots: 0.05 vertical spacing, and the x domain is
+    # narrowed to 0.94 when a secondary y-axis (battery) is present
+    vertical_spacing = 0.05
+    row_height = (1 - vertical_spacing * (num_rows - 1)) / num_rows
+    x_domain = [0.0, 0.94] if any(spec[0] == 'battery' for spec in plot_specs) else [0.0, 1.0]
+    show_stall = stall_speed is not None and isinstance(stall_speed, (int, float)) and stall_speed > 0
+
+    layout = {
+        'template': pio.templates[pio.templates.default].to_plotly_json(), # Applied by hand, figures are plain dicts
+        'width': width,
+        'height': height,
+        'margin': {'l': 60, 'r': 80, 't': 80, 'b': 50}, # Keep right margin for annotations
+        'hovermode': False, # Disable hover for static images
+        'showlegend': False, # Globally disable legend
+    }
+    annotations, shapes, rows = [], [], []
+    y_num = 0 # make_subplots numbers y-axes in creation order, secondary axes included
+    for row_idx, (plot_key, title, y_title, plot_traces, no_data_text) in enumerate(plot_specs, start=1):
+        x_name = f"x{row_idx}" if row_idx > 1 else "x"
+        y_num += 1
+        y_name = f"y{y_num}" if y_num > 1 else "y"
+        y_secondary = None
+        domain_bottom = (num_rows - row_idx) * (row_height + vertical_spacing)
+        domain = [domain_bottom, domain_bottom + row_height]
+
+        # Explicit date type so subplots without traces still get a time axis
+        x_axis = {'anchor': y_name, 'domain': x_domain, 'type': 'date'}
+        if row_idx < num_rows:
+            x_axis.update(matches=f"x{num_rows}" if num_rows > 1 else "x", showticklabels=False) # Shared x-axis
+        else:
+            x_axis['title'] = {'text': "Time"} # Add X axis title only to the bottom plot
+        # Y-axes auto-range based *only* on the data visible in the current window
+        y_axis = {'anchor': x_name, 'domain': domain}
+        if y_title:
+            y_axis['title'] = {'text': y_title}
+        layout['xaxis' + x_name[1:]] = x_axis
+        layout['yaxis' + y_name[1:]] = y_axis
+        if plot_key == 'battery':
+            # Current goes on a secondary y-axis overlaying this subplot
+            y_num += 1
+            y_secondary = f"y{y_num}"
+            layout['yaxis' + str(y_num)] = {'anchor': x_name, 'overlaying': y_name, 'side': 'right'}
+            if not plot_traces:
+                layout['yaxis' + str(y_num)]['visible'] = False # Hide secondary y-axis if no data
+
+        # Subplot title, centered above the subplot
+        annotations.append({'text': title, 'font': {'size': 16}, 'showarrow': False,
+                            'x': sum(x_domain) / 2, 'y': domain[1], 'xref': 'paper', 'yref': 'paper',
+                            'xanchor': 'center', 'yanchor': 'bottom'})
+        if no_data_text:
+            # Centered in the subplot area
+            annotations.append({'text': no_data_text, 'showarrow': False, 'x': 0.5, 'y': 0.5,
+                                'xref': f"{x_name} domain", 'yref': f"{y_name} domain"})
+
+        # Everything but the data of each trace and value label is fixed, so frames only
+        # copy these prebuilt dicts and add x/y (or text/y)
+        traces = []
+        for col_name, trace_name, color, dash, trace_abbr, secondary_y in plot_traces:
+            trace_base = _scatter_dict(trace_name, color, dash, x_name, y_secondary if secondary_y else y_name)
+            # Value label to the right of the plot area, aligned with the value on the y-axis.
+            # Always reference the primary y-axis of the subplot for annotation positioning.
+            value_base = {'showarrow': False, 'x': 1.02, 'xref': 'paper', 'yref': y_name,
+                          'font': {'color': color, 'size': 10}, 'bgcolor': "rgba(255,255,255,0.7)",
+                          'xanchor': 'left', 'yanchor': 'middle', 'align': 'left'}
+            traces.append((col_name, trace_abbr, trace_base, value_base))
+
+        # Vertical line for the current time moment. The x-range always ends at the current time,
+        # so the cursor sits on the right edge of the axis domain and never changes
+        shapes.append({'type': 'line', 'x0': 1, 'x1': 1, 'y0': 0, 'y1': 1,
+                       'xref': f"{x_name} domain", 'yref': f"{y_name} domain",
+                       'line': {'color': "black", 'width': 1.5, 'dash': "dash"}})
+
+        row = {'traces': traces, 'stall': None, 'x_key': 'xaxis' + x_name[1:]}
+        if plot_key == 'speed' and plot_traces and show_stall:
+            # Stall line spans the window data, so only its annotation is fully static
+            # (added after the value labels each frame so it is drawn on top of them)
+            row['stall'] = ({'type': 'line', 'y0': stall_speed, 'y1': stall_speed, 'xref': x_name, 'yref': y_name,
+                             'line': {'color': "OrangeRed", 'width': 2, 'dash': "dot"}},
+                            {'text': f"{stall_speed:.1f} Stall", 'showarrow': False,
+                             'x': 1.02, 'y': stall_speed, 'xref': 'paper', 'yref': y_name,
+                             'font': {'color': "OrangeRed", 'size': 10}, 'bgcolor': "rgba(255,255,255,0.7)",
+                             'xanchor': 'left', 'yanchor': 'middle'})
+        rows.append(row)
+
+    layout['annotations'] = annotations
+    layout['shapes'] = shapes
+    return {'layout': layout, 'rows': rows}
+
+
+def create_frame_figure(template, x_values, trace_data, last_row, col_index, current_time, x_range, log_identifier):
+    """
+    Creates the Plotly figure for a single frame of the animation as a plain
+    {'data': [...], 'layout': {...}} dict on top of the worker's cached template.
+    Only the traces, value annotations, shapes, title and x-range change per frame.
+    x_values holds the window timestamps as epoch milliseconds (the date axes read plain numbers as ms),
+    trace_data maps column name -> decimated (x, y) arrays and x_range is [window start, current time] in ms.
+    last_row holds every column's latest value in the window, col_index maps name -> position in it.
+    """
+    if x_values is None or len(x_values) == 0 or not template['rows']:
+        return None # Skip frame if no data or no active plots
+
+    layout = dict(template['layout']) # Shallow copy, the static parts are shared between frames
     frame_time_str = current_time.strftime('%H:%M:%S.%f')[:-3] # Format time
-    plot_title = f'{log_identifier} # {frame_time_str}'
+    layout['title'] = {'text': f'{log_identifier} # {frame_time_str}', 'x': 0.5} # Center title
+    traces, annotations, shapes = [], list(layout['annotations']), None
+    for row in template['rows']:
+        layout[row['x_key']] = dict(layout[row['x_key']], range=x_range)
+
+        for col_name, trace_abbr, trace_base, value_base in row['traces']:
+            # Plot the line segment for the current window
+            x_plot, y_plot = trace_data[col_name]
+            traces.append(dict(trace_base, x=x_plot, y=y_plot))
+
+            # Annotation for the current value; the last sample is the point closest to the current time
+            current_value = float(last_row[col_index[col_name]])
+            if not math.isnan(current_value):
+                annotations.append(dict(value_base, text=f"{current_value:.2f} {trace_abbr}", y=current_value))
+
+        if row['stall'] is not None:
+            # Stall speed line across the data in the window, plus its label
+            stall_line, stall_annotation = row['stall']
+            if shapes is None:
+                shapes = list(layout['shapes']) # Copy the static cursors only when a line is added
+            shapes.append(dict(stall_line, x0=x_values[0], x1=x_values[-1]))
+            annotations.append(stall_annotation)
+
+    layout['annotations'] = annotations
+    if shapes is not None:
+        layout['shapes'] = shapes
+    return {'data': traces, 'layout': layout}
+
+
+# --- Matplotlib Frame Renderer ---
+# Plotly dash styles mapped to matplotlib linestyles
+MPL_LINESTYLES = {None: '-', 'dash': '--', 'dot': ':', 'dashdot': '-.'}
+
+# Per-worker render state, populated once by _init_worker and reused for every frame
+_WORKER_STATE = {'backend': 'plotly'}
+# Per-thread matplotlib figure and artists (matplotlib backend renders in threads)
+_THREAD_LOCAL = threading.local()
+
+
+def _share_arrays(*arrays):
+    """
+    Copies arrays into new shared memory blocks. Returns the blocks (the caller closes and
+    unlinks them) and one (name, shape, dtype, order) spec per array for _attach_arrays.
+    """
+    blocks, specs = [], []
+    for arr in arrays:
+        order = 'F' if arr.flags.f_contiguous and not arr.flags.c_contiguous else 'C'
+        shm = shared_memory.SharedMemory(create=True, size=max(1, arr.nbytes))
+        np.ndarray(arr.shape, dtype=arr.dtype, buffer=shm.buf, order=order)[...] = arr
+        blocks.append(shm)
+        specs.append((shm.name, arr.shape, arr.dtype.str, order))
+    return blocks, specs
+
 
-    fig.update_layout(
-        title_text=plot_title,
-        title_x=0.5, # Center title
-        width=width,
-        height=height,
-        margin=dict(l=60, r=80, t=80, b=50), # Keep right margin for annotations
-        hovermode=False, # Disable hover for static images
-        showlegend=False # Globally disable legend
-    )
+def _attach_arrays(specs):
+    """Attaches to blocks made by _share_arrays, returns the blocks and zero-copy array views on them."""
+    blocks = [shared_memory.SharedMemory(name=name) for name, _, _, _ in specs]
+    arrays = [np.ndarray(shape, dtype=dtype, buffer=shm.buf, order=order)
+              for shm, (_, shape, dtype, order) in zip(blocks, specs)]
+    return blocks, arrays
 
-    # Update x-axis range to show the sliding window
-    start_time = current_time - timedelta(seconds=window_duration_secs)
-    # Ensure x-axis updates apply to all subplots sharing the axis
-    fig.update_xaxes(range=[start_time, current_time])
-    fig.update_xaxes(title_text="Time", row=num_rows, col=1) # Add X axis title only to the bottom plot
 
-    # Add vertical line for the current time moment
-    fig.add_vline(x=current_time, line_width=1.5, line_dash="dash", line_color="black", row='all', col=1)
+def _init_process_worker(array_specs, backend, col_names, *args):
+    """
+    Initializer for worker processes: maps ts_ns, col_matrix and last_valid from shared memory
+    instead of receiving a pickled copy each, then continues with _init_worker.
+    """
+    blocks, (ts_ns, col_matrix, last_valid) = _attach_arrays(array_specs)
+    _WORKER_STATE['data_shms'] = blocks # Keep the mappings alive for the worker's lifetime
+    _init_worker(backend, ts_ns, col_names, col_matrix, last_valid, *args)
 
-    # Ensure y-axes auto-range based *only* on the data visible in the current window
-    fig.update_yaxes(fixedrange=False) # Allow y-axis autoranging
 
-    return fig
+def kaleido_scope_available():
+    """
+    True if Kaleido's PlotlyScope can be imported and takes the plotlyjs/mathjax arguments the workers pass
+    (tested with kaleido 0.2.1). Checked once in the main process, without starting a Chromium subprocess.
+    """
+    try:
+        from kaleido.scopes.plotly import PlotlyScope
+    except ImportError:
+        return False
+    params = inspect.signature(PlotlyScope.__init__).parameters
+    return 'plotlyjs' in params and 'mathjax' in params
+
+def _init_worker(backend, ts_ns, col_names, col_matrix, last_valid, plot_specs, log_identifier, stall_speed, width, height,
+                 window_duration_secs, ring_name, ring_slots, use_kaleido_scope=True):
+    """
+    Worker initializer. Receives the plotted data once per worker as NumPy arrays
+    (ts_ns: sorted int64 timestamps, col_matrix: float columns named by col_names,
+    last_valid: see last_valid_indices), so tasks only carry a frame index, timestamp and output slot. Attaches the shared memory frame ring
+    (ring_slots I420 frames, created by create_flight_video as ring_name) that frames are written to.
+    For Plotly, also builds the layout template once.
+    The matplotlib backend runs in threads of the main process and calls this directly;
+    its figures are built per thread by _build_matplotlib_scene.
+    """
+    _WORKER_STATE.update(backend=backend, ts_ns=ts_ns, col_names=col_names, col_matrix=col_matrix,
+                         col_index={name: j for j, name in enumerate(col_names)},
+                         last_valid=last_valid, col_range=np.arange(len(col_names)),
+                         plot_specs=plot_specs,
+                         log_identifier=log_identifier, stall_speed=stall_speed, width=width, height=height,
+                         window_duration_secs=window_duration_secs)
+    ring_shm = shared_memory.SharedMemory(name=ring_name)
+    _WORKER_STATE.update(ring_shm=ring_shm,
+                         ring=np.ndarray((ring_slots, width * height * 3 // 2), dtype=np.uint8, buffer=ring_shm.buf))
+    if backend != 'matplotlib':
+        # Plotly: the subplot grid and static annotations are identical for every frame
+        _WORKER_STATE['template'] = build_plotly_template(plot_specs, stall_speed, width, height)
+        # One Kaleido scope per worker, its Chromium subprocess is started once and reused for every frame
+        # (plotly.js comes from the installed plotly package, the scope default would fetch it from a CDN)
+        # Without a usable scope (see kaleido_scope_available) frames fall back to pio.to_image
+        scope = None
+        if use_kaleido_scope:
+            from kaleido.scopes.plotly import PlotlyScope
+            import plotly
+            plotlyjs_path = os.path.join(os.path.dirname(os.path.abspath(plotly.__file__)), 'package_data', 'plotly.min.js')
+            # No MathJax (plots have no LaTeX), and PNG at the video size as the scope defaults
+            scope = PlotlyScope(plotlyjs=plotlyjs_path, mathjax=False)
+            scope.default_format = 'png'
+            scope.default_width = width
+            scope.default_height = height
+        _WORKER_STATE['scope'] = scope
+
+    # Numeric x for every sample, computed once: epoch milliseconds for Plotly date axes,
+    # matplotlib date numbers (days since its epoch) for matplotlib. Frames slice this array
+    # instead of converting or serializing datetimes
+    if backend == 'matplotlib':
+        import matplotlib.dates as mdates
+        x_offset_ns, x_unit_ns = int(np.datetime64(mdates.get_epoch(), 'ns').astype(np.int64)), 86400e9
+    else:
+        x_offset_ns, x_unit_ns = 0, 1e6
+    _WORKER_STATE.update(x_offset_ns=x_offset_ns, x_unit_ns=x_unit_ns,
+                         x_num=(ts_ns - x_offset_ns) / x_unit_ns)
+
+
+def _build_matplotlib_scene(state):
+    """
+    Builds the matplotlib figure, axes, line and annotation artists once, so frames
+    only push new data into them. Called once per rendering thread, as artists must
+    not be shared between threads.
+    """
+    # No pyplot: its global figure manager is not thread-safe, a bare Figure on an Agg canvas is
+    from matplotlib.figure import Figure
+    from matplotlib.backends.backend_agg import FigureCanvasAgg
+    import matplotlib.dates as mdates
+
+    width, height, stall_speed = state['width'], state['height'], state['stall_speed']
+    plot_specs = state['plot_specs']
+    num_rows = len(plot_specs)
+    dpi = 100
+    fig = Figure(figsize=(width / dpi, height / dpi), dpi=dpi)
+    FigureCanvasAgg(fig) # Headless raster canvas
+    axes = fig.subplots(num_rows, 1, sharex=True, squeeze=False)[:, 0]
+
+    # Match the Plotly layout: margins l=60, r=80, t=80, b=50 px and 0.05 vertical spacing
+    plot_h = 1 - (80 + 50) / height
+    gap = 0.05 * plot_h
+    axis_h = (plot_h - gap * (num_rows - 1)) / num_rows
+    fig.subplots_adjust(left=60 / width, right=1 - 80 / width, top=1 - 80 / height, bottom=50 / height, hspace=gap / axis_h)
+
+    annot_box = dict(facecolor='white', alpha=0.7, edgecolor='none', pad=1)
+    scaled_axes, lines, annots, cursors = [], {}, {}, []
+    for ax, (plot_key, title, y_title, traces, no_data_text) in zip(axes, plot_specs):
+        ax.xaxis_date()
+        ax.grid(True, color='#e5e5e5')
+        ax.set_title(title, fontsize=11)
+        if y_title: ax.set_ylabel(y_title, fontsize=9)
+        if no_data_text: ax.text(0.5, 0.5, no_data_text, transform=ax.transAxes, ha='center', va='center')
+        scaled_axes.append(ax)
+
+        secondary_ax = None
+        for col_name, trace_name, color, dash, trace_abbr, secondary_y in traces:
+            target_ax = ax
+            if secondary_y:
+                if secondary_ax is None:
+                    secondary_ax = ax.twinx()
+                    scaled_axes.append(secondary_ax)
+                target_ax = secondary_ax
+            line, = target_ax.plot([], [], color=color, linewidth=1.5, linestyle=MPL_LINESTYLES[dash])
+            # Current value label to the right of the plot area, y in data coordinates
+            text = target_ax.text(1.02, 0, '', transform=target_ax.get_yaxis_transform(), color=color, fontsize=8,
+                                  ha='left', va='center', bbox=annot_box, clip_on=False)
+            lines[(plot_key, col_name)] = line
+            annots[(plot_key, col_name)] = (text, trace_abbr)
+
+        if plot_key == 'speed' and traces and stall_speed is not None and stall_speed > 0:
+            ax.axhline(stall_speed, color='orangered', linewidth=2, linestyle=':')
+            ax.text(1.02, stall_speed, f"{stall_speed:.1f} Stall", transform=ax.get_yaxis_transform(), color='orangered',
+                    fontsize=8, ha='left', va='center', bbox=annot_box, clip_on=False)
+
+        # Vertical line for the current time moment
+        cursors.append(ax.axvline(0, color='black', linestyle='--', linewidth=1.5))
+
+    axes[-1].set_xlabel("Time")
+    axes[-1].xaxis.set_major_formatter(mdates.DateFormatter('%H:%M:%S'))
+
+    return dict(fig=fig, axes=scaled_axes, lines=lines, annots=annots, cursors=cursors,
+                title=fig.suptitle('', fontsize=14))
+
+
+def update_frame_figure(state, scene, trace_data, last_row, current_time, x_range, log_identifier):
+    """
+    Pushes the window data into the thread's prebuilt matplotlib artists (scene) and returns the figure.
+    x values and x_range ([window start, current time]) are matplotlib date numbers.
+    """
+    col_index = state['col_index']
+    for key, line in scene['lines'].items():
+        line.set_data(*trace_data[key[1]])
+        text, trace_abbr = scene['annots'][key]
+        current_value = float(last_row[col_index[key[1]]])
+        if not math.isnan(current_value):
+            text.set_text(f"{current_value:.2f} {trace_abbr}")
+            text.set_y(current_value)
+            text.set_visible(True)
+        else:
+            text.set_visible(False)
+    # Auto-range y based only on the data in the current window
+    for ax in scene['axes']:
+        ax.relim()
+        ax.autoscale_view(scalex=False, scaley=True)
+
+    # Shared x-axis: one set_xlim covers every subplot
+    scene['axes'][0].set_xlim(*x_range)
+
+    for cursor in scene['cursors']:
+        cursor.set_xdata([x_range[1], x_range[1]])
+
+    frame_time_str = current_time.strftime('%H:%M:%S.%f')[:-3] # Format time
+    scene['title'].set_text(f'{log_identifier} # {frame_time_str}')
+    return scene['fig']
 
 
 # --- Worker Function for Multiprocessing ---
 def generate_single_frame(args):
     """
-    Worker function designed to be called by ProcessPoolExecutor.
-    Generates a single frame image.
+    Worker function designed to be called by the frame executor (processes for Plotly,
+    threads for matplotlib).
+    Renders a single frame from the arrays set up by _init_worker, writes it as I420
+    (see rgb_to_i420) into the given slot of the shared frame ring and returns (i, True),
+    or (i, None) on skip/failure. Only the flag goes back to the main process, not the pixels.
     """
-    # Unpack arguments
-    # Note: df_clipped is passed here instead of df_merged
-    i, current_time, df_clipped, loaded_optional_types, active_plots, log_identifier, \
-    stall_speed, width, height, window_duration_secs, temp_dir = args
-
-    frame_filename = None # Initialize
-    fig = None
-    df_window = None
+    i, current_ns, slot = args
+    state = _WORKER_STATE
 
+    # No explicit cleanup: reference counting frees the frame's dicts/arrays on return,
+    # a forced gc.collect() per frame only walked the worker's whole heap
     try:
-        # Define the window of data to plot for this frame
-        window_start = current_time - timedelta(seconds=window_duration_secs)
-        # Select data within the time window ending at the current frame time
-        # Use the (potentially already clipped) df_clipped passed to the worker
-        df_window = df_clipped[(df_clipped.index >= window_start) & (df_clipped.index <= current_time)]
+        ts_ns = state['ts_ns']
+        window_ns = int(state['window_duration_secs'] * 1e9)
+        # Timestamps are sorted, so the window is a contiguous slice found by binary search
+        lo = np.searchsorted(ts_ns, current_ns - window_ns, 'left')
+        hi = np.searchsorted(ts_ns, current_ns, 'right')
 
-        if df_window.empty:
+        if lo == hi:
             # If no data exactly in window (e.g., start of log), try to get the very first point
-            # from the clipped data relevant to this worker
-            first_point = df_clipped.iloc[[0]]
-            if not first_point.empty and first_point.index[0] <= current_time:
-                 df_window = first_point
+            if ts_ns[0] <= current_ns:
+                lo, hi = 0, 1
             else:
                 # print(f"Warning: No data found for frame {i} at {current_time}. Skipping frame.")
-                return i, None # Return index and None for filename to indicate skip
+                return i, None # Return index and None to indicate skip
+
+        # Zero-copy views of the window, x already in the backend's numeric axis units
+        x_values = state['x_num'][lo:hi]
+        col_matrix = state['col_matrix']
+        # Latest valid value of every column in the window, NaN if the column has none in it
+        # (merged logs leave gaps, so the newest row alone can miss a column)
+        last_idx = state['last_valid'][hi - 1]
+        last_row = np.where(last_idx >= lo, col_matrix[last_idx, state['col_range']], np.nan)
+        current_time = pd.Timestamp(current_ns) # Only used for the title text
+        x_offset_ns, x_unit_ns = state['x_offset_ns'], state['x_unit_ns']
+        x_range = [(current_ns - window_ns - x_offset_ns) / x_unit_ns, (current_ns - x_offset_ns) / x_unit_ns] # Sliding window
+
+        # Column-major matrix: each column slice is contiguous. Traces are decimated
+        # to about two points per pixel column
+        trace_data = {name: downsample_minmax(x_values, col_matrix[lo:hi, j], state['width'])
+                      for name, j in state['col_index'].items()}
+        if state['backend'] != 'matplotlib':
+            # Plotly serializes floats with their full repr (17 digits); float32 precision is
+            # plenty for a 1080p plot and much shorter in the JSON sent to Kaleido
+            trace_data = {name: (x, round_significant(y)) for name, (x, y) in trace_data.items()}
+
+        if state['backend'] == 'matplotlib':
+            # Reuse this thread's prebuilt figure, only the artist data changes
+            scene = getattr(_THREAD_LOCAL, 'scene', None)
+            if scene is None:
+                scene = _THREAD_LOCAL.scene = _build_matplotlib_scene(state)
+            fig = update_frame_figure(state, scene, trace_data, last_row, current_time, x_range,
+                                      state['log_identifier'])
+            # Rasterize with Agg and take the pixels straight from the canvas, no PNG encode
+            fig.canvas.draw()
+            rgb = np.asarray(fig.canvas.buffer_rgba())[:, :, :3]
+            return i, _encoder_frame(i, rgb, state, slot)
 
         # Create the figure for this frame
-        fig = create_frame_figure(df_window, current_time, loaded_optional_types, active_plots, log_identifier, stall_speed, width, height, window_duration_secs)
+        fig = create_frame_figure(state['template'], x_values, trace_data, last_row, state['col_index'], current_time,
+                                  x_range, state['log_identifier'])
 
         if fig:
-            frame_filename = os.path.join(temp_dir, f"frame_{i:06d}.png")
             try:
-                # Save the figure as a PNG image
-                pio.write_image(fig, frame_filename, format='png', engine='kaleido')
-                return i, frame_filename # Return index and filename on success
+                # Render in memory with the worker's Kaleido scope and decode here, in parallel across workers
+                # The dict is built by hand, so it goes straight to Kaleido without Plotly's figure validation
+                scope = state['scope']
+                if scope is not None:
+                    png_bytes = scope.transform(fig) # PNG at width x height, set as scope defaults
+                else:
+                    png_bytes = pio.to_image(fig, format='png', width=state['width'], height=state['height'])
+                return i, _encoder_frame(i, iio.imread(png_bytes)[:, :, :3], state, slot) # Return index and success flag
             except Exception as e:
                 print(f"\nError saving frame {i} with Kaleido: {e}")
                 # Fall through to return None
@@ -328,18 +597,104 @@ def generate_single_frame(args):
     except Exception as e:
         print(f"\nError generating figure for frame {i}: {e}")
         # Fall through to return None
-    finally:
-        # Explicitly delete large objects to potentially help memory management in worker processes
-        del fig
-        del df_window
-        gc.collect() # Optionally trigger garbage collection
 
-    return i, None # Return index and None for filename to indicate failure/skip
+    return i, None # Return index and None to indicate failure/skip
+
+
+def _encoder_frame(i, rgb, state, slot):
+    """Checks a rendered RGB frame's size and converts it into its ring slot in the I420 layout ffmpeg reads."""
+    if rgb.shape != (state['height'], state['width'], 3):
+        print(f"\nWarning: Frame {i} has size {rgb.shape[1]}x{rgb.shape[0]}, expected {state['width']}x{state['height']}. Skipping.")
+        return None
+    # Per thread (or process) conversion buffers, so converting a frame allocates nothing
+    scratch = getattr(_THREAD_LOCAL, 'i420_scratch', None)
+    if scratch is None:
+        scratch = _THREAD_LOCAL.i420_scratch = i420_scratch(state['width'], state['height'])
+    rgb_to_i420(rgb, out=state['ring'][slot], scratch=scratch)
+    return True
+
+
+def _release_worker_ring():
+    """Drops this process's view of the frame ring and detaches from it."""
+    _WORKER_STATE.pop('ring', None)
+    ring_shm = _WORKER_STATE.pop('ring_shm', None)
+    if ring_shm is not None:
+        ring_shm.close()
+
+
+# --- Video Encoding ---
+def i420_scratch(width, height):
+    """Preallocated uint16 work buffers for rgb_to_i420: full size R, G, B planes, their 2x2 averages and two accumulators."""
+    return (np.empty((3, height, width), dtype=np.uint16),
+            np.empty((3, height // 2, width // 2), dtype=np.uint16),
+            np.empty((2, height // 2, width // 2), dtype=np.uint16))
+
+
+def rgb_to_i420(rgb, out=None, scratch=None):
+    """
+    Converts an RGB uint8 frame (even width and height) to planar YUV 4:2:0 (I420): the full
+    size Y plane followed by the quarter size U and V planes, as one flat uint8 array
+    (written into out if given). scratch (from i420_scratch) lets repeated calls skip all
+    per-frame allocation.
+    BT.601 limited range integer math, the same matrix ffmpeg uses for rgb24 -> yuv420p.
+    Done in the workers so the pipe carries half the bytes and ffmpeg skips its conversion.
+    """
+    h, w = rgb.shape[:2]
+    if out is None:
+        out = np.empty(h * w * 3 // 2, dtype=np.uint8)
+    if scratch is None:
+        scratch = i420_scratch(w, h)
+    full, half, (acc, term) = scratch
+    # uint16 is enough for every intermediate (at most ~61k) and halves the memory traffic of int32.
+    # Everything is computed in place in the scratch buffers
+    for c in range(3):
+        np.copyto(full[c], rgb[:, :, c])
+    # Chroma from the average of each 2x2 block, taken before the planes are scaled for Y
+    for plane, avg in zip(full, half):
+        np.add(plane[0::2, 0::2], plane[1::2, 0::2], out=avg)
+        avg += plane[0::2, 1::2]; avg += plane[1::2, 1::2]; avg += 2; avg >>= 2
+    r, g, b = full
+    r *= 66; g *= 129; b *= 25; r += g; r += b; r += 128 + (16 << 8); r >>= 8
+    out[:h * w].reshape(h, w)[:] = r
+    # Negative coefficients are applied to (255 - c), the offset folded back into the constant
+    r, g, b = half
+    chroma = h * w // 4
+    for (pos, pos_k), negatives, plane_out in (((b, 112), ((r, 38), (g, 74)), out[h * w:h * w + chroma]),
+                                               ((r, 112), ((g, 94), (b, 18)), out[h * w + chroma:])):
+        np.multiply(pos, pos_k, out=acc)
+        for c, k in negatives:
+            np.subtract(255, c, out=term); term *= k; acc += term
+        acc += 4336; acc >>= 8
+        plane_out.reshape(h // 2, w // 2)[:] = acc
+    return out
+
+
+def open_ffmpeg_writer(output_path, width, height, fps, encoder_threads=0):
+    """
+    Starts an ffmpeg process that reads raw I420 (yuv420p) frames of width x height from stdin
+    and encodes them to H.264. Uses ffmpeg from PATH, or the binary bundled with imageio-ffmpeg.
+    encoder_threads=0 lets x264 pick the thread count from the CPU count.
+    """
+    ffmpeg_exe = shutil.which('ffmpeg')
+    if ffmpeg_exe is None:
+        import imageio_ffmpeg
+        ffmpeg_exe = imageio_ffmpeg.get_ffmpeg_exe()
+    cmd = [ffmpeg_exe, '-y', '-loglevel', 'error',
+           '-f', 'rawvideo', '-pix_fmt', 'yuv420p', '-s', f'{width}x{height}', '-r', str(fps), '-i', 'pipe:0',
+           '-an', '-c:v', 'libx264',
+           # Plot frames are mostly flat colour: the fastest preset at CRF 28 still looks clean.
+           # No B-frames or lookahead, a keyframe every 30 frames
+           '-preset', 'ultrafast', '-tune', 'zerolatency', '-crf', '28',
+           '-x264-params', 'keyint=30:bframes=0', '-threads', str(encoder_threads),
+           '-pix_fmt', 'yuv420p', # Broad compatibility, required by many players/codecs (same as the input, no conversion)
+           output_path]
+    # Pipe buffer of one frame, so each write hands a whole frame to ffmpeg
+    return subprocess.Popen(cmd, stdin=subprocess.PIPE, stderr=subprocess.PIPE, bufsize=width * height * 3 // 2)
 
 
 # --- Main Video Generation Logic ---
-def create_flight_video(df_merged, loaded_optional_types, active_plots, log_identifier, stall_speed, width, height, output_path, fps, window_duration_secs, start_frame=0, max_frames=None, start_time_str=None, end_time_str=None, disable_cleaning=False): # Added start/end time args
-    """Generates frames in parallel and compiles them into a video."""
+def create_flight_video(df_merged, loaded_optional_types, active_plots, log_identifier, stall_speed, width, height, output_path, fps, window_duration_secs, start_frame=0, max_frames=None, start_time_str=None, end_time_str=None, backend='plotly', encoder_threads=0): # Added start/end time args
+    """Generates frames in parallel and pipes them, in order, into an ffmpeg encoder."""
 
     print(f"\n--- Starting Video Generation ---")
     print(f"Log: {log_identifier}")
@@ -347,6 +702,7 @@ def create_flight_video(df_merged, loaded_optional_types, active_plots, log_iden
     print(f"Resolution: {width}x{height}")
     print(f"FPS: {fps}")
     print(f"Time Window: {window_duration_secs} seconds")
+    print(f"Render Backend: {backend}")
     if stall_speed: print(f"Stall Speed: {stall_speed} m/s")
 
     # --- Time Clipping ---
@@ -454,12 +810,17 @@ def create_flight_video(df_merged, loaded_optional_types, active_plots, log_iden
     # --- End Time Clipping ---
 
 
+    # Timestamps are kept as wall-clock int64 ns (the times shown on the plots)
+    clipped_index = df_clipped.index.tz_localize(None) if df_clipped.index.tz is not None else df_clipped.index
+    ts_ns = clipped_index.to_numpy().astype('datetime64[ns]').view(np.int64) # Index may be us resolution
+
     # Determine time range and frame times *from the clipped data*
-    start_time = df_clipped.index.min()
-    end_time = df_clipped.index.max()
-    total_duration = (end_time - start_time).total_seconds()
+    start_ns, end_ns = int(ts_ns[0]), int(ts_ns[-1]) # Index is sorted by the loader
+    total_duration = (end_ns - start_ns) / 1e9
     total_possible_frames = int(total_duration * fps)
-    all_frame_timestamps = pd.to_datetime(np.linspace(start_time.value, end_time.value, total_possible_frames))
+    # Frame times stay int64 ns: one frame every 1/fps seconds from the first sample
+    step_ns = int(round(1e9 / fps))
+    all_frame_ns = start_ns + np.arange(total_possible_frames, dtype=np.int64) * step_ns
 
     print(f"Selected data duration: {total_duration:.2f} seconds")
     print(f"Total possible frames in selected range: {total_possible_frames}")
@@ -484,8 +845,8 @@ def create_flight_video(df_merged, loaded_optional_types, active_plots, log_iden
         return
 
     # Adjust frame timestamps and calculate num_frames based on limits
-    frame_timestamps_to_process = all_frame_timestamps[frame_indices_to_process]
-    num_frames_to_generate = len(frame_timestamps_to_process)
+    frame_ns = all_frame_ns[frame_indices_to_process]
+    num_frames_to_generate = len(frame_ns)
     # Keep track of the original index *within the clipped range* for file naming and ordering
     original_indices = frame_indices_to_process
 
@@ -496,26 +857,20 @@ def create_flight_video(df_merged, loaded_optional_types, active_plots, log_iden
     print(f"Output File: {output_path}")
 
 
-    # Create temporary directory for frames
-    temp_dir = tempfile.mkdtemp(prefix="flight_video_frames_")
-    print(f"Using temporary directory for frames: {temp_dir}")
-
-    # Prepare arguments for each task
-    tasks = []
-    # Use enumerate over the selected timestamps, but pass the original index
-    for i, original_index in enumerate(original_indices):
-        current_time = frame_timestamps_to_process[i]
-        # Bundle arguments for the worker function, using original_index for file naming
-        # Pass df_clipped instead of df_merged
-        task_args = (
-            original_index, current_time, df_clipped, loaded_optional_types,
-            active_plots, log_identifier, stall_speed, width, height,
-            window_duration_secs, temp_dir
-        )
-        tasks.append(task_args)
+    # Convert the plotted columns to NumPy once; workers receive them through the
+    # initializer instead of a pickled df_clipped per task
+    plot_specs = build_plot_specs(active_plots, loaded_optional_types, df_clipped.columns)
+    needed_cols = list(dict.fromkeys(trace[0] for _, _, _, traces, _ in plot_specs for trace in traces))
+    # One float matrix in Fortran order, so window slices of a column stay contiguous
+    col_matrix = np.asfortranarray(df_clipped[needed_cols].to_numpy(dtype=float, na_value=np.nan))
+    last_valid = last_valid_indices(col_matrix)
+
+    # Prepare arguments for each task: the original index (for ordering) and frame time, the ring slot is added on submit
+    tasks = list(zip(original_indices, frame_ns.tolist()))
 
-    # Dictionary to store results (frame filenames) keyed by original index
-    frame_results = {}
+    num_written = 0
+    ffmpeg_proc = None
+    ffmpeg_error = None
 
     # Determine number of workers
     # Leave 1-2 cores free for system responsiveness if needed, default to 1 if cpu_count fails
@@ -523,86 +878,85 @@ def create_flight_video(df_merged, loaded_optional_types, active_plots, log_iden
     num_workers = max(1, cpu_cores - 1 if cpu_cores else 1)
     print(f"Starting frame generation with {num_workers} workers...")
 
-    try:
-        # Use ProcessPoolExecutor for CPU-bound tasks
-        with concurrent.futures.ProcessPoolExecutor(max_workers=num_workers) as executor:
-            # Submit all tasks
-            future_to_task_args = {executor.submit(generate_single_frame, task): task for task in tasks}
-
-            # Process results as they complete with a progress bar
-            for future in tqdm(concurrent.futures.as_completed(future_to_task_args), total=len(tasks), desc="Generating Frames"):
-                task_args = future_to_task_args[future]
-                task_index = task_args[0] # Get the original index 'i'
-                try:
-                    idx, result_filename = future.result()
-                    if idx == task_index: # Sanity check
-                        frame_results[idx] = result_filename # Store filename or None
-                    else:
-                         print(f"Warning: Mismatched index from worker! Expected {task_index}, got {idx}. Storing result anyway.")
-                         frame_results[task_index] = result_filename # Store under expected index
-                except Exception as exc:
-                    print(f'\nFrame generation task {task_index} generated an exception: {exc}')
-                    frame_results[task_index] = None # Mark as failed
-
-        # Collect successful and valid frame filenames in the correct order
-        successful_frame_files = []
-        print("\nValidating generated frames...")
-        # Iterate through the original indices we intended to generate
-        for i in tqdm(original_indices, desc="Validating Frames"):
-            filename = frame_results.get(i) # Get filename using the original index
-            if filename:
-                # --- Validation Step ---
-                try:
-                    if os.path.exists(filename) and os.path.getsize(filename) > 0:
-                        successful_frame_files.append(filename)
-                    elif not os.path.exists(filename):
-                         print(f"Warning: Frame file for index {i} reported but not found: {filename}. Skipping.")
-                    else: # Exists but size is 0
-                         print(f"Warning: Frame file for index {i} is empty: {filename}. Skipping.")
-                except OSError as e:
-                     print(f"Warning: Error accessing frame file for index {i} ({filename}): {e}. Skipping.")
-            # else: # Optional: report skipped/failed frames from generation phase
-            #     print(f"Frame {i} was skipped or failed during generation.")
-
-
-        # --- Compile Video ---
-        num_valid_frames = len(successful_frame_files)
-        print(f"\nCompiling {num_valid_frames} valid frames into video...")
-        if not successful_frame_files:
-            print("Error: No valid frames were generated or found.")
-            # Cleanup happens in finally block
-            return
+    # Frames travel through a shared memory ring of 2 slots per worker instead of being pickled back:
+    # a worker writes its frame into a slot, the main process pipes the slots to ffmpeg in frame order
+    # and only then hands the slot to the next task, so at most ring_slots frames are in flight
+    frame_bytes = width * height * 3 // 2
+    ring_slots = min(len(tasks), 2 * num_workers)
+    ring_shm = shared_memory.SharedMemory(create=True, size=ring_slots * frame_bytes)
+    ring = np.ndarray((ring_slots, frame_bytes), dtype=np.uint8, buffer=ring_shm.buf)
+
+    use_kaleido_scope = backend != 'matplotlib' and kaleido_scope_available()
+    if backend != 'matplotlib' and not use_kaleido_scope:
+        print("Warning: Kaleido PlotlyScope (kaleido 0.2.x) not available, rendering frames with plotly.io.to_image instead (slower).")
+    render_args = (plot_specs, log_identifier, stall_speed, width, height, window_duration_secs, ring_shm.name, ring_slots,
+                   use_kaleido_scope)
+    data_shms = []
+    if backend == 'matplotlib':
+        # Agg rasterizes in C, so threads share the arrays in place: no pickling, no per-worker copies
+        _init_worker(backend, ts_ns, needed_cols, col_matrix, last_valid, *render_args)
+        executor = concurrent.futures.ThreadPoolExecutor(max_workers=num_workers)
+    else:
+        # Use ProcessPoolExecutor for the Kaleido path, figure building is Python/GIL bound.
+        # The data arrays go to shared memory once, workers map them instead of each
+        # unpickling its own copy (spawn/forkserver start methods pickle initargs per worker)
+        data_shms, array_specs = _share_arrays(ts_ns, col_matrix, last_valid)
+        executor = concurrent.futures.ProcessPoolExecutor(max_workers=num_workers, initializer=_init_process_worker,
+                                                          initargs=(array_specs, backend, needed_cols, *render_args))
 
-        # Use imageio to create the video
-        # Ensure macro_block_size is compatible with video dimensions and codec (often 16 for H.264)
-        # Using None lets imageio choose, which is generally safer.
-        # Use pixelformat='yuv420p' for broad compatibility, required by many players/codecs
-        with iio.get_writer(output_path, fps=fps, macro_block_size=None, pixelformat='yuv420p', codec='libx264') as writer:
-             # Use tqdm on the validated list
-             for filename in tqdm(successful_frame_files, desc="Writing Video"):
-                 try:
-                     # Read the image data using iio (imageio v2)
-                     image = iio.imread(filename)
-                     # Append data to the video file
-                     writer.append_data(image)
-                 except FileNotFoundError:
-                     # This shouldn't happen after our validation, but handle defensively
-                     print(f"Warning: Frame file disappeared before compilation: {filename}. Skipping.")
-                 except Exception as e:
-                     # Catch other potential errors during imread or append_data
-                     # Provide more specific error info
-                     print(f"Warning: Error processing frame {filename} during compilation: {type(e).__name__} - {e}. Skipping.")
-
-
-        print(f"\nVideo saved successfully to: {output_path}")
+    try:
+        with executor:
+            # Fill every slot, then consume futures in submission (= frame) order and refill each
+            # slot once its frame is written (generate_single_frame catches its own errors
+            # and returns None for failed frames)
+            task_iter = iter(tasks)
+            pending = collections.deque((slot, executor.submit(generate_single_frame, (*task, slot)))
+                                        for slot, task in zip(range(ring_slots), task_iter))
+            # Refresh the bar at most every 0.5 s (and every ~0.5% of frames) so the consumer loop
+            # spends its time writing frames, not redrawing the bar
+            progress = tqdm(total=len(tasks), desc="Generating Frames",
+                            mininterval=0.5, smoothing=0.1, miniters=max(1, len(tasks) // 200))
+            while pending:
+                slot, future = pending.popleft()
+                frame_index, frame_ok = future.result()
+                progress.update()
+                if frame_ok:
+                    if ffmpeg_proc is None:
+                        ffmpeg_proc = open_ffmpeg_writer(output_path, width, height, fps, encoder_threads)
+                    try:
+                        ffmpeg_proc.stdin.write(ring[slot].data) # Raw I420 bytes straight from shared memory
+                        num_written += 1
+                    except BrokenPipeError:
+                        print(f"\nError: ffmpeg exited while writing frame {frame_index}.")
+                        break
+                # The slot's frame is consumed (or was skipped), reuse it for the next task
+                next_task = next(task_iter, None)
+                if next_task is not None:
+                    pending.append((slot, executor.submit(generate_single_frame, (*next_task, slot))))
+            progress.close()
 
     finally:
-        # Clean up temporary directory only if disable_cleaning is False
-        if not disable_cleaning:
-            print(f"Cleaning up temporary directory: {temp_dir}")
-            shutil.rmtree(temp_dir, ignore_errors=True)
-        else:
-            print(f"Temporary directory preserved: {temp_dir}")
+        # Workers are done with the ring once the executor has shut down
+        if backend == 'matplotlib':
+            _release_worker_ring() # Threads used this process's own attachment
+        del ring
+        for shm in [ring_shm, *data_shms]:
+            shm.close()
+            shm.unlink()
+        if ffmpeg_proc is not None:
+            # Closes stdin so ffmpeg flushes the file, then waits for it
+            _, stderr_bytes = ffmpeg_proc.communicate()
+            if ffmpeg_proc.returncode != 0:
+                ffmpeg_error = stderr_bytes.decode(errors='replace').strip()
+
+    if ffmpeg_error is not None:
+        print(f"Error: ffmpeg failed with exit code {ffmpeg_proc.returncode}: {ffmpeg_error}")
+        return
+    if num_written == 0:
+        print("Error: No valid frames were generated.")
+        return
+
+    print(f"\nVideo with {num_written} frames saved successfully to: {output_path}")
 
 
 # --- Main Execution Block ---
@@ -639,12 +993,16 @@ if __name__ == "__main__":
     # --- Frame Limit Arguments (applied *after* time clipping) ---
     parser.add_argument("--start-frame", type=int, default=0, help="Frame number to start generation from (0-based index, relative to the time-clipped range).")
     parser.add_argument("--max-frames", type=int, default=None, help="Maximum number of frames to generate (relative to the time-clipped range).")
-    # --- Added disable-cleaning Argument ---
-    parser.add_argument("--disable-cleaning", action='store_true', help="Prevent deletion of the temporary frame directory.")
+    parser.add_argument("--backend", default="plotly", choices=['plotly', 'matplotlib'], help="Frame renderer: 'plotly' (Kaleido) or 'matplotlib' (Agg, reuses one figure per worker, much faster).")
+    parser.add_argument("--encoder-threads", type=int, default=0, help="x264 encoder threads (0 = auto). Lower it on small boards to leave cores for rendering.")
+    parser.add_argument("--log-level", default="INFO", choices=['DEBUG', 'INFO', 'WARNING', 'ERROR'], help="Verbosity of data loading messages.")
 
 
     args = parser.parse_args()
 
+    # Configure logging once for the data loader (WARNING skips per-file INFO lines)
+    logging.basicConfig(level=args.log_level, format='%(levelname)s: %(message)s')
+
     # --- Validate Dimensions ---
     if args.width % 2 != 0:
         print(f"Error: Video width (--width) must be an even number. Received: {args.width}")
@@ -702,8 +1060,8 @@ if __name__ == "__main__":
             end_time_str=args.end_time,
             start_frame=args.start_frame,
             max_frames=args.max_frames,
-            # --- Pass disable_cleaning Argument ---
-            disable_cleaning=args.disable_cleaning
+            backend=args.backend,
+            encoder_threads=args.encoder_threads
         )
     except Exception as e:
         print(f"\nAn unexpected error occurred during video generation: {e}")
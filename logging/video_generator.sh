@@ -1,4 +1,4 @@
-# pip install pandas plotly "kaleido>=0.1.0,<0.2.0" imageio imageio-ffmpeg tqdm # Use specific kaleido range for better compatibility initially
+# pip install pandas plotly "kaleido==0.2.1" matplotlib imageio imageio-ffmpeg tqdm # kaleido 0.2.1 is the version the per-worker PlotlyScope rendering was tested with
 python flight_video_generator.py \
         --att-csv CSV_OUTPUT/00000053.ATT.csv \
         --imu-csv CSV_OUTPUT/00000053.IMU.csv \
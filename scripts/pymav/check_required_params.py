@@ -35,16 +35,22 @@ except Exception as e:
 # Request all parameters
 vehicle.mav.param_request_list_send(vehicle.target_system, vehicle.target_component)
 params = {}
-start_time = time.time()
 timeout = 10  # seconds
+deadline = time.monotonic() + timeout
+PARAM_VALUE_ID = mavutil.mavlink.MAVLINK_MSG_ID_PARAM_VALUE
 
-while time.time() - start_time < timeout:
+# Drain everything that arrived, filter on the numeric message id, and only wait on the port
+# when nothing is buffered. Stops as soon as the full parameter set is in.
+while time.monotonic() < deadline:
     try:
-        message = vehicle.recv_match(type='PARAM_VALUE', blocking=True, timeout=1)
-        if message:
-            param_id = message.param_id
-            param_value = message.param_value
-            params[param_id] = param_value
+        message = vehicle.recv_msg()
+        if message is None:
+            vehicle.select(0.05)  # Wait for more bytes instead of spinning
+            continue
+        if message.get_msgId() == PARAM_VALUE_ID:
+            params[message.param_id] = message.param_value
+            if len(params) >= message.param_count:
+                break
     except Exception as e:
         break
 
@@ -1,5 +1,5 @@
 from pymavlink import mavutil
-import csv
+import pandas as pd
 import time
 
 # Connect to the autopilot
@@ -14,35 +14,43 @@ except Exception as e:
 
 # Request all parameters
 vehicle.mav.param_request_list_send(vehicle.target_system, vehicle.target_component)
-parameters = []
-start_time = time.time()
+parameters = {}  # Keyed on param_id, so repeated PARAM_VALUE broadcasts just overwrite
 timeout = 10  # seconds
+deadline = time.monotonic() + timeout
+PARAM_VALUE_ID = mavutil.mavlink.MAVLINK_MSG_ID_PARAM_VALUE
 
-while time.time() - start_time < timeout:
+# Drain everything that arrived, filter on the numeric message id, and only wait on the port
+# when nothing is buffered. Stops as soon as the full parameter set is in.
+while time.monotonic() < deadline:
     try:
-        message = vehicle.recv_match(type='PARAM_VALUE', blocking=True, timeout=1)
-        if message:
-            param_id = message.param_id  # No .decode() needed; it's already a string
-            param_value = message.param_value
-            param_type = message.param_type
-            parameters.append({
-                'param_id': param_id,
-                'value': param_value,
-                'type': param_type
-            })
-            print(f"Received: {param_id} = {param_value}")
+        message = vehicle.recv_msg()
+        if message is None:
+            vehicle.select(0.05)  # Wait for more bytes instead of spinning
+            continue
+        if message.get_msgId() != PARAM_VALUE_ID:
+            continue
+        param_id = message.param_id  # No .decode() needed; it's already a string
+        param_value = message.param_value
+        param_type = message.param_type
+        parameters[param_id] = {
+            'param_id': param_id,
+            'value': param_value,
+            'type': param_type
+        }
+        # No per-parameter print here: hundreds arrive per second and terminal output was the slow part
+        if len(parameters) >= message.param_count:
+            break
     except Exception as e:
         print(f"Error receiving parameter: {e}")
         break
 
+print(f"Received {len(parameters)} parameters")
+
 # Save all parameters to CSV
 try:
-    with open('all_parameters.csv', 'w', newline='') as csvfile:
-        fieldnames = ['param_id', 'value', 'type']
-        writer = csv.DictWriter(csvfile, fieldnames=fieldnames)
-        writer.writeheader()
-        for param in parameters:
-            writer.writerow(param)
+    # One bulk write; CRLF line endings as the csv module wrote them before
+    pd.DataFrame(list(parameters.values()), columns=['param_id', 'value', 'type']).to_csv(
+        'all_parameters.csv', index=False, lineterminator='\r\n')
     print("Parameters saved to all_parameters.csv")
 except Exception as e:
     print(f"Error saving CSV: {e}")
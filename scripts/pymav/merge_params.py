@@ -1,5 +1,12 @@
-import csv
 import os
+import pandas as pd
+
+# PyArrow's multithreaded CSV parser when it is installed, pandas' C parser otherwise
+try:
+    import pyarrow  # noqa: F401
+    CSV_ENGINE = 'pyarrow'
+except ImportError:
+    CSV_ENGINE = 'c'
 
 # File paths
 base_dir = os.path.dirname(__file__)
@@ -8,41 +15,27 @@ params_path = os.path.join(base_dir, 'parameters.csv')
 output_path = os.path.join(base_dir, 'full_params.csv')
 
 def read_params(file_path):
-    params = {}
-    with open(file_path, newline='', encoding='utf-8') as csvfile:
-        reader = csv.DictReader(csvfile)
-        for row in reader:
-            params[row['param_id']] = row
-    return params
+    # Values stay strings so they are compared and written back exactly as in the file;
+    # a repeated param_id keeps its last row
+    params = pd.read_csv(file_path, dtype=str, keep_default_na=False, engine=CSV_ENGINE)
+    return params.drop_duplicates('param_id', keep='last')
 
 def main():
     # Read both files
     default_params = read_params(default_params_path)
     params = read_params(params_path)
 
-    # Prepare merged data
-    merged = []
-    for param_id in sorted(default_params):
-        default_row = default_params[param_id]
-        actual_row = params.get(param_id, default_row)
-        merged.append({
-            'param_id': param_id,
-            'default': default_row['value'],
-            'actual': actual_row['value'],
-            'type': default_row['type']
-        })
+    # Join on param_id; parameters missing from parameters.csv keep their default value
+    merged = default_params.merge(params[['param_id', 'value']], on='param_id', how='left', suffixes=('_default', '_actual'))
+    merged['actual'] = merged['value_actual'].fillna(merged['value_default'])
+    merged = merged.rename(columns={'value_default': 'default'})
 
     # Drop unchanged values
-    merged = [row for row in merged if row['default'] != row['actual']]
+    merged = merged[merged['default'] != merged['actual']].sort_values('param_id')
 
     # Write to full_params.csv
-    with open(output_path, 'w', newline='', encoding='utf-8') as csvfile:
-        fieldnames = ['param_id', 'default', 'actual', 'type']
-        writer = csv.DictWriter(csvfile, fieldnames=fieldnames)
-        writer.writeheader()
-        for row in merged:
-            writer.writerow(row)
+    merged[['param_id', 'default', 'actual', 'type']].to_csv(output_path, index=False, lineterminator='\r\n')  # Same line endings as the csv module
     print(f"Merged parameters written to {output_path}")
 
 if __name__ == '__main__':
-    main() 
\ No newline at end of file
+    main()
@@ -1,22 +1,68 @@
+import os
+import sys
 import time
-import math
-from pymavlink import mavutil
-import time
+import select
+import struct
+import argparse
+import threading
+from binascii import crc_hqx
+from collections import deque
+
+# pymavlink is imported on first use (load_mavutil), so --help doesn't pay for loading the dialect
+mavutil = None
+
+def load_mavutil():
+    global mavutil
+    if mavutil is None:
+        from pymavlink import mavutil as module
+        mavutil = module
+    return mavutil
+
+# Bit-reversal table for every byte value
+_BITREV = bytes(int(f'{i:08b}'[::-1], 2) for i in range(256))
+
+class FastX25crc(object):
+    """
+    Drop-in for pymavlink's pure-Python x25crc (CRC-16/MCRF4XX). This is the same CCITT polynomial as
+    binascii.crc_hqx but bit-reflected, so reflect the input bytes and the 16-bit state around the C call.
+    """
+
+    def __init__(self, buf=None):
+        self.crc = 0xFFFF
+        if buf is not None:
+            self.accumulate(buf)
+
+    def accumulate(self, buf):
+        crc = self.crc
+        crc = crc_hqx(bytes(buf).translate(_BITREV), (_BITREV[crc & 0xFF] << 8) | _BITREV[crc >> 8])
+        self.crc = (_BITREV[crc & 0xFF] << 8) | _BITREV[crc >> 8]
+
+def install_fast_crc(connection):
+    """
+    Make the connection's dialect check and sign frames with FastX25crc (it looks x25crc up at call time).
+    Call after wait_heartbeat(): the first frame may switch mavutil.mavlink to the v20 dialect module.
+    Returns True if the module the connection's parser comes from now uses FastX25crc.
+    """
+    load_mavutil().mavlink.x25crc = FastX25crc
+    parser_module = sys.modules[type(connection.mav).__module__]
+    parser_module.x25crc = FastX25crc
+    return mavutil.mavlink.x25crc is FastX25crc and parser_module.x25crc is FastX25crc
 
 def connect_to_vehicle(port='COM4', baud=1500000):
     print(f"Connecting to vehicle on {port} at {baud} baud...")
-    connection = mavutil.mavlink_connection(port, baud=baud)
+    connection = load_mavutil().mavlink_connection(port, baud=baud)
     connection.wait_heartbeat()
     print("Heartbeat received. Connection established.")
     return connection
 
-def request_data_streams(connection):
-    # Request DATA_STREAM_ALL at 10 Hz
+def request_data_streams(connection, rate_hz=50):
+    # Request only EXTRA3 (carries RANGEFINDER) instead of DATA_STREAM_ALL, fast enough that
+    # every control step has a fresh measurement
     connection.mav.request_data_stream_send(
         connection.target_system,
         connection.target_component,
-        mavutil.mavlink.MAV_DATA_STREAM_ALL,
-        10,  # Rate in Hz
+        mavutil.mavlink.MAV_DATA_STREAM_EXTRA3,
+        rate_hz,  # Rate in Hz
         1    # Start streaming
     )
 
@@ -39,74 +85,222 @@ def send_rc_override(connection, ch2_value):
         0           # CH8
     )
 
-def main():
-    import argparse
+def make_rc_override_sender(connection, ch2_value=1500):
+    """
+    Return send(ch2_value) that writes a pre-encoded RC_CHANNELS_OVERRIDE frame.
+    Only CH2, the sequence number and the CRC change between sends, so the frame is packed
+    once and patched in place instead of building and packing a message object every step.
+    """
+    mav = connection.mav
+    if mav.signing.sign_outgoing:
+        # Signed frames also carry a timestamp and signature, keep the regular path
+        return lambda value: send_rc_override(connection, value)
+
+    # Encoded with a non-zero CH2 so MAVLink2 trailing-zero truncation can't cut the field off
+    msg = mav.rc_channels_override_encode(
+        connection.target_system, connection.target_component,
+        0, ch2_value, 0, 0, 0, 0, 0, 0
+    )
+    frame = bytearray(msg.pack(mav))
+    is_v2 = frame[0] == mavutil.mavlink.PROTOCOL_MARKER_V2
+    seq_offset = 4 if is_v2 else 2
+    ch2_offset = (10 if is_v2 else 6) + 2  # After the header and chan1_raw
+    crc_offset = len(frame) - 2
+    crc_extra = bytes([msg.crc_extra])
+    x25crc = mavutil.mavlink.x25crc
+    write = connection.write
+
+    def send(value):
+        frame[seq_offset] = mav.seq
+        struct.pack_into('<H', frame, ch2_offset, value)
+        crc = x25crc(memoryview(frame)[1:crc_offset])
+        crc.accumulate(crc_extra)
+        struct.pack_into('<H', frame, crc_offset, crc.crc)
+        write(frame)
+        mav.seq = (mav.seq + 1) % 256  # Same bookkeeping as mav.send()
+
+    return send
+
+def read_rangefinder(connection, latest, stop, errors):
+    """
+    Reader thread: parse incoming bytes and keep only the newest RANGEFINDER sample in `latest`,
+    a deque(maxlen=1) of (distance, sample_count). The control loop peeks at it without locks,
+    so parser latency and message bursts no longer delay the RC overrides.
+    On a read error or EOF (link dropped) the exception is put in `errors` and the thread ends;
+    the control loop sees the thread is gone and raises, so main() sends the neutral override.
+    """
+    try:
+        _read_rangefinder_loop(connection, latest, stop)
+    except Exception as e:
+        errors.append(e)
 
+def _read_rangefinder_loop(connection, latest, stop):
+    # On a POSIX serial port read the fd directly in 4 KB chunks and parse them in one call;
+    # recv_match pulls only the bytes the parser asks for, often one syscall per byte at 1.5 Mbaud.
+    # Ports without a fileno (e.g. COM ports on Windows) keep the recv_match path
+    try:
+        port_fd = connection.port.fileno()
+    except (AttributeError, OSError, ValueError):
+        port_fd = None
+    parse_buffer = connection.mav.parse_buffer
+    recv_match = connection.recv_match
+    # Module functions and methods bound to locals for the loop
+    wait_readable = select.select
+    read = os.read
+    push = latest.append
+    stopped = stop.is_set
+    count = 0
+    while not stopped():
+        if port_fd is not None:
+            # Short timeout so the stop flag is checked regularly
+            if not wait_readable([port_fd], [], [], 0.1)[0]:
+                continue
+            data = read(port_fd, 4096)
+            if not data:
+                # Readable but empty: the device went away, don't spin on it
+                raise EOFError("serial port closed")
+            msgs = parse_buffer(data) or ()
+        else:
+            msg = recv_match(type='RANGEFINDER', blocking=True, timeout=0.1)
+            msgs = (msg,) if msg is not None else ()
+        for msg in msgs:
+            if msg.get_type() == 'RANGEFINDER':
+                count += 1
+                push((msg.distance, count))
+
+def _compute_pwm(goal, height, kp, center, lo, hi):
+    """P controller: CH2 PWM for the measured height, clamped to [lo, hi]."""
+    # pwm = int(center + kp * (goal - height)) # Reversed
+    pwm = int(center - kp * (goal - height))
+    return lo if pwm < lo else hi if pwm > hi else pwm
+
+def main():
     parser = argparse.ArgumentParser(description="Auto height control using rangefinder and vtail elevons (CH2).")
     parser.add_argument('--port', type=str, default='/dev/ttyS0', help='Serial port to connect to (default: /dev/ttyS0)')
     parser.add_argument('--baud', type=int, default=1500000, help='Baud rate for serial connection (default: 1500000)')
     parser.add_argument('--goal', type=float, default=1, help='Goal height in meters (default: 1.0)')
     parser.add_argument('--kp', type=float, default=500.0, help='Proportional gain for controller (default: 400.0)')
+    parser.add_argument('--period', type=float, default=0.05, help='Control loop period in seconds (default: 0.05)')
+    parser.add_argument('--stream-rate', type=int, default=50, help='Requested RANGEFINDER (EXTRA3) stream rate in Hz (default: 50)')
     args = parser.parse_args()
 
     vehicle = connect_to_vehicle(args.port, args.baud)
-    request_data_streams(vehicle)
+    # After the heartbeat, so the patch lands on the dialect module the link actually uses
+    if not install_fast_crc(vehicle):
+        print("Warning: fast CRC not installed, using pymavlink's x25crc.")
+    request_data_streams(vehicle, args.stream_rate)
+
+    # Reader thread fills a one-slot lossy buffer, the control loop below always uses the freshest sample
+    latest = deque(maxlen=1)
+    stop_reader = threading.Event()
+    reader_errors = []
+    reader = threading.Thread(target=read_rangefinder, args=(vehicle, latest, stop_reader, reader_errors), daemon=True)
+    reader.start()
 
     center_pwm = 1500  # Neutral PWM value for CH2
     min_pwm = 989
     max_pwm = 2013
     goal_height = args.goal
     kp = args.kp
+    send_ch2 = make_rc_override_sender(vehicle, center_pwm)
 
     print(f"Auto height control started. Goal: {goal_height} m. Press Ctrl+C to stop.")
 
-    # Frequency metrics
-    loop_count = 0
-    rangefinder_count = 0
-    last_rangefinder_time = time.time()
-    last_loop_time = time.time()
-    loop_freq = 0.0
-    rangefinder_freq = 0.0
+    # Fixed-rate control loop: one control step per period, on absolute deadlines.
+    # All timing is integer nanoseconds from a single time.monotonic_ns() read per step
+    period_ns = int(args.period * 1e9)
+    no_data_timeout_ns = 1_000_000_000  # Without RANGEFINDER for this long, report it missing
+
+    # Frequency metrics as EWMAs with 1/32 weight (shift instead of division): the step
+    # interval in ns, and RANGEFINDER messages per step in 1/256 units. Converted to Hz only when printed
+    loop_dt_ewma_ns = period_ns
+    rf_per_step_ewma = 0
+    last_loop_ns = time.monotonic_ns()
+    last_msg_ns = last_loop_ns
+    last_sample_count = 0
+    # An unchanged override is only re-sent as a keepalive, well inside the autopilot's RC override timeout
+    keepalive_ns = 500_000_000
+    last_sent_pwm = None
+    last_sent_ns = 0
+    # Status line is redrawn at most 10 times a second, so terminal writes don't delay the overrides
+    print_interval_ns = 100_000_000
+    next_print_ns = 0
+    status_write = sys.stdout.write
+    status_flush = sys.stdout.flush
+    # Module functions bound to locals for the loop
+    monotonic_ns = time.monotonic_ns
+    sleep = time.sleep
+    compute_pwm = _compute_pwm
 
     try:
+        next_tick_ns = time.monotonic_ns()
         while True:
-            loop_start = time.time()
-            msg = vehicle.recv_match(type='RANGEFINDER', blocking=True, timeout=1)
-            loop_count += 1
-            now = time.time()
-            # Update loop frequency every second
-            if now - last_loop_time >= 1.0:
-                loop_freq = loop_count / (now - last_loop_time)
-                loop_count = 0
-                last_loop_time = now
-            if msg is None:
-                print(f"\rNo RANGEFINDER data received. | Loop Hz: {loop_freq:.1f} | RF Hz: {rangefinder_freq:.1f}   ", end="")
+            # Sleep until this step's slot; deadlines advance by the period, so there is no drift.
+            # After an overrun (e.g. a stalled serial write) restart from now instead of bursting to catch up
+            now_ns = monotonic_ns()
+            delay_ns = next_tick_ns - now_ns
+            if delay_ns > 0:
+                sleep(delay_ns / 1e9)
+                now_ns = next_tick_ns  # Woke at the deadline, no second clock read
+            elif delay_ns < -period_ns:
+                next_tick_ns = now_ns
+            next_tick_ns += period_ns
+
+            # Take the newest sample from the reader thread; the count tells how many arrived since the last step
+            distance = None
+            rf_count = 0
+            if latest:
+                sample, sample_count = latest[-1]
+                if sample_count != last_sample_count:
+                    distance = sample
+                    rf_count = sample_count - last_sample_count
+                    last_sample_count = sample_count
+            loop_dt_ewma_ns = (loop_dt_ewma_ns * 31 + (now_ns - last_loop_ns)) >> 5
+            rf_per_step_ewma = (rf_per_step_ewma * 31 + (rf_count << 8)) >> 5
+            last_loop_ns = now_ns
+            show_status = now_ns >= next_print_ns
+            if show_status:
+                next_print_ns = now_ns + print_interval_ns
+                loop_freq = 1e9 / max(loop_dt_ewma_ns, 1)
+                rangefinder_freq = rf_per_step_ewma / 256 * loop_freq
+                # Rate suffix shared by all status lines, formatted once per redraw
+                rates = " | Loop Hz: %.1f | RF Hz: %.1f   " % (loop_freq, rangefinder_freq)
+            if distance is None:
+                if not reader.is_alive():
+                    # Reader hit a read error or EOF; leave the loop through the neutral-override path below
+                    error = reader_errors[0] if reader_errors else None
+                    raise RuntimeError(f"RANGEFINDER reader stopped: {error}") from error
+                # No new measurement this step, hold the last override
+                if show_status and now_ns - last_msg_ns >= no_data_timeout_ns:
+                    status_write("\rNo RANGEFINDER data received." + rates)
+                    status_flush()
                 continue
-            rangefinder_count += 1
-            # Update rangefinder frequency every second
-            if now - last_rangefinder_time >= 1.0:
-                rangefinder_freq = rangefinder_count / (now - last_rangefinder_time)
-                rangefinder_count = 0
-                last_rangefinder_time = now
-            if msg.distance == 0:
-                print(f"\rInvalid RANGEFINDER value (0). Skipping. | Loop Hz: {loop_freq:.1f} | RF Hz: {rangefinder_freq:.1f}   ", end="")
+            last_msg_ns = now_ns
+            if distance == 0:
+                if show_status:
+                    status_write("\rInvalid RANGEFINDER value (0). Skipping." + rates)
+                    status_flush()
                 continue
-            current_height = msg.distance
-            error = goal_height - current_height
-            control = kp * error
-            # ch2_pwm = int(center_pwm + control) # Reversed
-            ch2_pwm = int(center_pwm - control)
-            ch2_pwm = max(min_pwm, min(max_pwm, ch2_pwm))
-            send_rc_override(vehicle, ch2_pwm)
-            print(f"\rHeight: {current_height:.2f} m | Error: {error:.2f} | CH2 PWM: {ch2_pwm} | Loop Hz: {loop_freq:.1f} | RF Hz: {rangefinder_freq:.1f}   ", end="")
-            # time.sleep(0.05)
+            current_height = distance
+            ch2_pwm = compute_pwm(goal_height, current_height, kp, center_pwm, min_pwm, max_pwm)
+            if ch2_pwm != last_sent_pwm or now_ns - last_sent_ns >= keepalive_ns:
+                send_ch2(ch2_pwm)
+                last_sent_pwm = ch2_pwm
+                last_sent_ns = now_ns
+            if show_status:
+                status_write("\rHeight: %.2f m | Error: %.2f | CH2 PWM: %d%s" % (current_height, goal_height - current_height, ch2_pwm, rates))
+                status_flush()
     except KeyboardInterrupt:
         print("\nProgram interrupted by user. Sending neutral RC override and closing connection...")
+        stop_reader.set()
+        reader.join(timeout=1.0)
         send_rc_override(vehicle, center_pwm)
         vehicle.close()
         print("Connection closed.")
     except Exception as e:
         print(f"\nAn error occurred: {e}")
+        stop_reader.set()
+        reader.join(timeout=1.0)
         send_rc_override(vehicle, center_pwm)
         vehicle.close()
         print(f"Error occurred at line {e.__traceback__.tb_lineno}: {str(e)}")
@@ -1,3 +1,4 @@
+import sys
 import time
 import math
 from pymavlink import mavutil
@@ -43,33 +44,48 @@ def main():
         amplitude = 300  # PWM amplitude (±300 from center)
         center_pwm = 1500  # Neutral PWM value for CH2
         frequency = 0.5  # Hz (one cycle every 2 seconds)
+        tick_period = 0.01  # Seconds between overrides
+
+        # One period of the signal, precomputed: at a fixed tick the sinusoid repeats every
+        # period_ticks samples, so the loop only indexes this table
+        period_ticks = int(round(1.0 / (frequency * tick_period)))
+        pwm_table = []
+        for k in range(period_ticks):
+            # Calculate CH2 PWM value, clamped to the safe range (1000-2000)
+            ch2_pwm = int(center_pwm + math.sin(2 * math.pi * k / period_ticks) * amplitude)
+            pwm_table.append(max(1000, min(2000, ch2_pwm)))
 
         print("Sending sinusoidal RC override to CH2 for elevon control... (Press Ctrl+C to stop)")
 
-        start_time = time.time()
+        start_time = time.monotonic()
+        tick = 0
+        # Status line is redrawn at most 10 times a second, so terminal writes don't delay the overrides
+        print_interval = 0.1
+        next_print = 0.0
 
         while True:
-            # Calculate current time offset
-            elapsed_time = time.time() - start_time
-
-            # Generate sinusoidal signal for CH2
-            angle = 2 * math.pi * frequency * elapsed_time
-            signal = math.sin(angle) * amplitude
-
-            # Calculate CH2 PWM value
-            ch2_pwm = int(center_pwm + signal)
-
-            # Clamp PWM value to safe range (1000-2000)
-            ch2_pwm = max(1000, min(2000, ch2_pwm))
+            ch2_pwm = pwm_table[tick % period_ticks]
 
             # Send RC override for CH2
             send_rc_override(vehicle, ch2_pwm)
 
             # Print current value for monitoring
-            print(f"\rCH2 PWM (Elevons): {ch2_pwm:.0f}", end="")
-
-            # Small delay to prevent overwhelming the system
-            time.sleep(0.01)
+            now = time.monotonic()
+            if now >= next_print:
+                sys.stdout.write(f"\rCH2 PWM (Elevons): {ch2_pwm:.0f}")
+                sys.stdout.flush()
+                next_print = now + print_interval
+
+            # Sleep until the next tick's absolute deadline, so send/print time doesn't accumulate as drift.
+            # After an overrun (e.g. a stalled serial write) restart the schedule from now instead of
+            # sending a burst of overrides to catch up
+            tick += 1
+            now = time.monotonic()
+            delay = start_time + tick * tick_period - now
+            if delay > 0:
+                time.sleep(delay)
+            elif delay < -tick_period:
+                start_time = now - tick * tick_period
 
     except KeyboardInterrupt:
         print("\nProgram interrupted by user. Sending neutral RC override and closing connection...")
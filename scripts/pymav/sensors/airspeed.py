@@ -2,6 +2,8 @@ import time
 from pymavlink import mavutil
 from tqdm import tqdm
 
+REFRESH_INTERVAL = 0.1  # Seconds between bar redraws
+
 def connect_to_vehicle(port='/dev/ttyS0', baud=1500000):
     print(f"Connecting to vehicle on {port} at {baud} baud...")
     connection = mavutil.mavlink_connection(port, baud=baud)
@@ -10,11 +12,11 @@ def connect_to_vehicle(port='/dev/ttyS0', baud=1500000):
     return connection
 
 def request_data_streams(connection):
-    # Request DATA_STREAM_ALL at 10 Hz
+    # Request only EXTRA2 (carries VFR_HUD) at 10 Hz instead of DATA_STREAM_ALL
     connection.mav.request_data_stream_send(
         connection.target_system,
         connection.target_component,
-        mavutil.mavlink.MAV_DATA_STREAM_ALL,
+        mavutil.mavlink.MAV_DATA_STREAM_EXTRA2,
         10,  # Rate in Hz
         1    # Start streaming
     )
@@ -32,25 +34,32 @@ def main():
         # Initialize tqdm bar for airspeed (assuming a max of 50 m/s for display)
         airspeed_bar = tqdm(total=50, desc='Airspeed (m/s)', position=0, leave=True, bar_format='{l_bar}{bar}| {n:.2f}/{total} m/s')
 
-        # Store last airspeed to avoid unnecessary tqdm updates
+        # Store last airspeed (rounded to the displayed precision) to avoid unnecessary tqdm updates
         last_airspeed = None
+        # The bar is redrawn at most every REFRESH_INTERVAL, not once per message
+        bar_dirty = False
+        next_refresh = 0.0
 
         while True:
-            # Wait for a MAVLink message
-            msg = vehicle.recv_match(blocking=True)
-
-            if msg is None:
-                continue
+            # Wait for a VFR_HUD message, everything else is skipped inside recv_match
+            msg = vehicle.recv_match(type='VFR_HUD', blocking=True, timeout=0.2)
 
-            # Handle VFR_HUD message for airspeed
-            if msg.get_type() == 'VFR_HUD':
-                airspeed = msg.airspeed  # Airspeed in meters per second
+            if msg is not None:
+                # VFR_HUD carries the airspeed
+                airspeed = round(msg.airspeed, 2)  # Airspeed in meters per second
                 # Clamp and update tqdm
                 if last_airspeed != airspeed:
                     airspeed_bar.n = min(max(airspeed, 0), airspeed_bar.total)
-                    airspeed_bar.refresh()
+                    bar_dirty = True
                     last_airspeed = airspeed
 
+            # Redraw once the interval has passed (also on timeouts, so the last value shows)
+            now = time.monotonic()
+            if bar_dirty and now >= next_refresh:
+                airspeed_bar.refresh()
+                bar_dirty = False
+                next_refresh = now + REFRESH_INTERVAL
+
     except KeyboardInterrupt:
         print("\nProgram interrupted by user. Closing connection...")
         vehicle.close()
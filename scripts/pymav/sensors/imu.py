@@ -3,6 +3,11 @@ import argparse
 from pymavlink import mavutil
 from tqdm import tqdm
 
+REFRESH_INTERVAL = 0.1  # Seconds between bar redraws
+ACCEL_SCALE = 9.81e-3   # milli-g to m/s²
+GYRO_SCALE = 1e-3       # milli-rad/s to rad/s
+IMU_TYPES = {'RAW_IMU'}  # recv_match filter, a set so it isn't wrapped in a new list on every call
+
 def connect_to_vehicle(port='/dev/ttyS0', baud=1500000):
     print(f"Connecting to vehicle on {port} at {baud} baud...")
     connection = mavutil.mavlink_connection(port, baud=baud)
@@ -11,11 +16,11 @@ def connect_to_vehicle(port='/dev/ttyS0', baud=1500000):
     return connection
 
 def request_data_streams(connection):
-    # Request DATA_STREAM_ALL at 10 Hz
+    # Request only RAW_SENSORS (carries RAW_IMU) at 10 Hz instead of DATA_STREAM_ALL
     connection.mav.request_data_stream_send(
         connection.target_system,
         connection.target_component,
-        mavutil.mavlink.MAV_DATA_STREAM_ALL,
+        mavutil.mavlink.MAV_DATA_STREAM_RAW_SENSORS,
         10,  # Rate in Hz
         1    # Start streaming
     )
@@ -50,58 +55,45 @@ def main():
         gyroy_bar = tqdm(total=gyro_range, desc='Gyro Y (rad/s)', position=4, leave=True, bar_format='{l_bar}{bar}| {n:.2f}/{total} rad/s', initial=-gyro_min)
         gyroz_bar = tqdm(total=gyro_range, desc='Gyro Z (rad/s)', position=5, leave=True, bar_format='{l_bar}{bar}| {n:.2f}/{total} rad/s', initial=-gyro_min)
 
-        # Store last values to avoid unnecessary tqdm updates
-        last_accelx = None
-        last_accely = None
-        last_accelz = None
-        last_gyrox = None
-        last_gyroy = None
-        last_gyroz = None
+        # One entry per axis: bar, clamp limits and last value (rounded to the displayed precision)
+        bars = [accelx_bar, accely_bar, accelz_bar, gyrox_bar, gyroy_bar, gyroz_bar]
+        limits = [(accel_min, accel_max)] * 3 + [(gyro_min, gyro_max)] * 3
+        last_values = [None] * 6
+        # Changed bars are redrawn together at most every REFRESH_INTERVAL, not once per message
+        dirty_bars = set()
+        next_refresh = 0.0
+        recv_match = vehicle.recv_match  # Bound once for the loop
 
         while True:
-            # Wait for a MAVLink message
-            msg = vehicle.recv_match(blocking=True)
-
-            if msg is None:
-                continue
+            # Wait for RAW_IMU only, everything else is skipped inside recv_match
+            msg = recv_match(type=IMU_TYPES, blocking=True, timeout=0.2)
 
-            # Handle RAW_IMU message
-            if msg.get_type() == 'RAW_IMU':
+            if msg is not None:
                 # Convert raw values to physical units
-                accel_x = msg.xacc / 1000.0 * 9.81  # Convert milli-g to m/s²
-                accel_y = msg.yacc / 1000.0 * 9.81  # Convert milli-g to m/s²
-                accel_z = msg.zacc / 1000.0 * 9.81  # Convert milli-g to m/s²
-                gyro_x = msg.xgyro / 1000.0  # Convert milli-rad/s to rad/s
-                gyro_y = msg.ygyro / 1000.0  # Convert milli-rad/s to rad/s
-                gyro_z = msg.zgyro / 1000.0  # Convert milli-rad/s to rad/s
-
-                # Clamp and update tqdm for accelerometer (centered at zero)
-                if last_accelx != accel_x:
-                    accelx_bar.n = min(max(accel_x, accel_min), accel_max) - accel_min
-                    accelx_bar.refresh()
-                    last_accelx = accel_x
-                if last_accely != accel_y:
-                    accely_bar.n = min(max(accel_y, accel_min), accel_max) - accel_min
-                    accely_bar.refresh()
-                    last_accely = accel_y
-                if last_accelz != accel_z:
-                    accelz_bar.n = min(max(accel_z, accel_min), accel_max) - accel_min
-                    accelz_bar.refresh()
-                    last_accelz = accel_z
-
-                # Clamp and update tqdm for gyroscope (centered at zero)
-                if last_gyrox != gyro_x:
-                    gyrox_bar.n = min(max(gyro_x, gyro_min), gyro_max) - gyro_min
-                    gyrox_bar.refresh()
-                    last_gyrox = gyro_x
-                if last_gyroy != gyro_y:
-                    gyroy_bar.n = min(max(gyro_y, gyro_min), gyro_max) - gyro_min
-                    gyroy_bar.refresh()
-                    last_gyroy = gyro_y
-                if last_gyroz != gyro_z:
-                    gyroz_bar.n = min(max(gyro_z, gyro_min), gyro_max) - gyro_min
-                    gyroz_bar.refresh()
-                    last_gyroz = gyro_z
+                values = (
+                    round(msg.xacc * ACCEL_SCALE, 2),
+                    round(msg.yacc * ACCEL_SCALE, 2),
+                    round(msg.zacc * ACCEL_SCALE, 2),
+                    round(msg.xgyro * GYRO_SCALE, 2),
+                    round(msg.ygyro * GYRO_SCALE, 2),
+                    round(msg.zgyro * GYRO_SCALE, 2),
+                )
+
+                # Clamp and update the bars whose value changed (centered at zero)
+                for i, value in enumerate(values):
+                    if last_values[i] != value:
+                        lo, hi = limits[i]
+                        bars[i].n = min(max(value, lo), hi) - lo
+                        dirty_bars.add(bars[i])
+                        last_values[i] = value
+
+            # Redraw changed bars once the interval has passed (also on timeouts, so the last value shows)
+            now = time.monotonic()
+            if dirty_bars and now >= next_refresh:
+                for bar in dirty_bars:
+                    bar.refresh()
+                dirty_bars.clear()
+                next_refresh = now + REFRESH_INTERVAL
 
     except KeyboardInterrupt:
         print("\nProgram interrupted by user. Closing connection...")
@@ -4,6 +4,12 @@ from pymavlink import mavutil
 from tqdm import tqdm
 import math
 
+REFRESH_INTERVAL = 0.1  # Seconds between bar redraws
+
+# Both messages carry the same xmag/ymag/zmag fields (SCALED_IMU is the alternative magnetometer source).
+# A set rather than a frozenset: recv_match takes a str, list or set and would wrap anything else
+_MAG_TYPES = {'RAW_IMU', 'SCALED_IMU'}
+
 def connect_to_vehicle(port='/dev/ttyS0', baud=1500000):
     print(f"Connecting to vehicle on {port} at {baud} baud...")
     connection = mavutil.mavlink_connection(port, baud=baud)
@@ -12,23 +18,39 @@ def connect_to_vehicle(port='/dev/ttyS0', baud=1500000):
     return connection
 
 def request_data_streams(connection):
-    # Request DATA_STREAM_ALL at 10 Hz
+    # Request only RAW_SENSORS (carries RAW_IMU and SCALED_IMU) at 10 Hz instead of DATA_STREAM_ALL
     connection.mav.request_data_stream_send(
         connection.target_system,
         connection.target_component,
-        mavutil.mavlink.MAV_DATA_STREAM_ALL,
+        mavutil.mavlink.MAV_DATA_STREAM_RAW_SENSORS,
         10,  # Rate in Hz
         1    # Start streaming
     )
 
 def calculate_heading(mag_x, mag_y):
     """Calculate magnetic heading from X and Y magnetometer readings"""
-    heading_rad = math.atan2(mag_y, mag_x)
-    heading_deg = math.degrees(heading_rad)
-    # Normalize to 0-360 degrees
-    if heading_deg < 0:
-        heading_deg += 360
-    return heading_deg
+    # atan2 gives (-180, 180]; the modulo folds it to 0-360 degrees without a branch
+    return math.degrees(math.atan2(mag_y, mag_x)) % 360.0
+
+def _update_bars(mag_x, mag_y, mag_z, bars, last_values, dirty_bars, mag_min, mag_max):
+    """Clamp and update the X/Y/Z bars whose value changed, marking them for the next redraw"""
+    magx_bar, magy_bar, magz_bar = bars
+    last_magx, last_magy, last_magz = last_values
+
+    if last_magx != mag_x:
+        magx_bar.n = min(max(mag_x, mag_min), mag_max) - mag_min
+        dirty_bars.add(magx_bar)
+        last_values[0] = mag_x
+
+    if last_magy != mag_y:
+        magy_bar.n = min(max(mag_y, mag_min), mag_max) - mag_min
+        dirty_bars.add(magy_bar)
+        last_values[1] = mag_y
+
+    if last_magz != mag_z:
+        magz_bar.n = min(max(mag_z, mag_min), mag_max) - mag_min
+        dirty_bars.add(magz_bar)
+        last_values[2] = mag_z
 
 def main():
     # Parse command line arguments
@@ -63,82 +85,49 @@ def main():
         heading_bar = tqdm(total=heading_range, desc='Heading (deg)', position=3, leave=True, 
                           bar_format='{l_bar}{bar}| {n:.1f}° / {total}°', initial=0)
 
+        bars = (magx_bar, magy_bar, magz_bar)
         # Store last values to avoid unnecessary tqdm updates
-        last_magx = None
-        last_magy = None
-        last_magz = None
+        last_values = [None, None, None]
         last_heading = None
+        # X/Y readings summed over each REFRESH_INTERVAL window: the heading of the summed vector is the
+        # smoothed heading of those samples (no wrap-around issue at 0/360), with one atan2 per window.
+        # The window has its own deadline, so it restarts even when nothing needed a redraw
+        sum_x = sum_y = 0
+        samples = 0
+        next_heading = 0.0
+        recv_match = vehicle.recv_match  # Bound once for the loop
+        # Changed bars are redrawn together at most every REFRESH_INTERVAL, not once per message
+        dirty_bars = set()
+        next_refresh = 0.0
 
         while True:
-            # Wait for a MAVLink message
-            msg = vehicle.recv_match(blocking=True)
-
-            if msg is None:
-                continue
-
-            # Handle RAW_IMU message (contains magnetometer data)
-            if msg.get_type() == 'RAW_IMU':
-                # Extract magnetometer values (in mGauss)
-                mag_x = msg.xmag
-                mag_y = msg.ymag
-                mag_z = msg.zmag
-                
-                # Calculate magnetic heading
-                heading = calculate_heading(mag_x, mag_y)
-
-                # Clamp and update tqdm for magnetometer readings
-                if last_magx != mag_x:
-                    magx_bar.n = min(max(mag_x, mag_min), mag_max) - mag_min
-                    magx_bar.refresh()
-                    last_magx = mag_x
-                    
-                if last_magy != mag_y:
-                    magy_bar.n = min(max(mag_y, mag_min), mag_max) - mag_min
-                    magy_bar.refresh()
-                    last_magy = mag_y
-                    
-                if last_magz != mag_z:
-                    magz_bar.n = min(max(mag_z, mag_min), mag_max) - mag_min
-                    magz_bar.refresh()
-                    last_magz = mag_z
-
-                # Update heading bar
-                if last_heading != heading:
-                    heading_bar.n = heading
-                    heading_bar.refresh()
-                    last_heading = heading
+            # Wait for RAW_IMU / SCALED_IMU (magnetometer data, in mGauss), everything else is skipped inside recv_match
+            msg = recv_match(type=_MAG_TYPES, blocking=True, timeout=0.2)
 
-            # Also handle SCALED_IMU message if available (alternative magnetometer source)
-            elif msg.get_type() == 'SCALED_IMU':
-                # Extract magnetometer values (in mGauss)
+            if msg is not None:
                 mag_x = msg.xmag
                 mag_y = msg.ymag
-                mag_z = msg.zmag
-                
-                # Calculate magnetic heading
-                heading = calculate_heading(mag_x, mag_y)
-
-                # Clamp and update tqdm for magnetometer readings
-                if last_magx != mag_x:
-                    magx_bar.n = min(max(mag_x, mag_min), mag_max) - mag_min
-                    magx_bar.refresh()
-                    last_magx = mag_x
-                    
-                if last_magy != mag_y:
-                    magy_bar.n = min(max(mag_y, mag_min), mag_max) - mag_min
-                    magy_bar.refresh()
-                    last_magy = mag_y
-                    
-                if last_magz != mag_z:
-                    magz_bar.n = min(max(mag_z, mag_min), mag_max) - mag_min
-                    magz_bar.refresh()
-                    last_magz = mag_z
-
-                # Update heading bar
+                _update_bars(mag_x, mag_y, msg.zmag, bars, last_values, dirty_bars, mag_min, mag_max)
+                sum_x += mag_x
+                sum_y += mag_y
+                samples += 1
+
+            # Redraw changed bars once the interval has passed (also on timeouts, so the last value shows)
+            now = time.monotonic()
+            if samples and now >= next_heading:
+                heading = round(calculate_heading(sum_x, sum_y), 1)  # Displayed precision
                 if last_heading != heading:
                     heading_bar.n = heading
-                    heading_bar.refresh()
+                    dirty_bars.add(heading_bar)
                     last_heading = heading
+                sum_x = sum_y = 0
+                samples = 0
+                next_heading = now + REFRESH_INTERVAL
+            if dirty_bars and now >= next_refresh:
+                for bar in dirty_bars:
+                    bar.refresh()
+                dirty_bars.clear()
+                next_refresh = now + REFRESH_INTERVAL
 
     except KeyboardInterrupt:
         print("\nProgram interrupted by user. Closing connection...")
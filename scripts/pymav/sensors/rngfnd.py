@@ -2,6 +2,8 @@ import time
 from pymavlink import mavutil
 from tqdm import tqdm
 
+REFRESH_INTERVAL = 0.1  # Seconds between bar redraws
+
 def connect_to_vehicle(port='COM4', baud=115200):
     print(f"Connecting to vehicle on {port} at {baud} baud...")
     connection = mavutil.mavlink_connection(port, baud=baud)
@@ -10,11 +12,11 @@ def connect_to_vehicle(port='COM4', baud=115200):
     return connection
 
 def request_data_streams(connection):
-    # Request DATA_STREAM_ALL at 10 Hz
+    # Request only EXTRA3 (carries RANGEFINDER and OPTICAL_FLOW) at 10 Hz instead of DATA_STREAM_ALL
     connection.mav.request_data_stream_send(
         connection.target_system,
         connection.target_component,
-        mavutil.mavlink.MAV_DATA_STREAM_ALL,
+        mavutil.mavlink.MAV_DATA_STREAM_EXTRA3,
         10,  # Rate in Hz
         1    # Start streaming
     )
@@ -34,41 +36,51 @@ def main():
         flowx_bar = tqdm(total=10, desc='FlowX (px)', position=1, leave=True, bar_format='{l_bar}{bar}| {n}/{total} px')
         flowy_bar = tqdm(total=10, desc='FlowY (px)', position=2, leave=True, bar_format='{l_bar}{bar}| {n}/{total} px')
 
-        # Store last values to avoid unnecessary tqdm updates
+        # Store last values (rounded to the displayed precision) to avoid unnecessary tqdm updates
         last_distance = None
         last_flowx = None
         last_flowy = None
+        # Changed bars are redrawn together at most every REFRESH_INTERVAL, not once per message
+        dirty_bars = set()
+        next_refresh = 0.0
 
         while True:
-            # Wait for a MAVLink message
-            msg = vehicle.recv_match(blocking=True)
+            # Wait for one of the two messages we display, everything else is skipped inside recv_match
+            msg = vehicle.recv_match(type=['RANGEFINDER', 'OPTICAL_FLOW'], blocking=True, timeout=0.2)
 
-            if msg is None:
-                continue
+            msg_type = msg.get_type() if msg is not None else None
 
             # Handle RANGEFINDER message
-            if msg.get_type() == 'RANGEFINDER':
-                distance = msg.distance  # Distance in meters
+            if msg_type == 'RANGEFINDER':
+                distance = round(msg.distance, 2)  # Distance in meters
                 # Clamp and update tqdm
                 if last_distance != distance:
                     rngfnd_bar.n = min(max(distance, 0), rngfnd_bar.total)
-                    rngfnd_bar.refresh()
+                    dirty_bars.add(rngfnd_bar)
                     last_distance = distance
 
             # Handle OPTICAL_FLOW message
-            if msg.get_type() == 'OPTICAL_FLOW':
-                flow_x = msg.flow_comp_m_x  # Flow in x-axis (pixels)
-                flow_y = msg.flow_comp_m_y  # Flow in y-axis (pixels)
+            elif msg_type == 'OPTICAL_FLOW':
+                flow_x = round(msg.flow_comp_m_x, 2)  # Flow in x-axis (pixels)
+                flow_y = round(msg.flow_comp_m_y, 2)  # Flow in y-axis (pixels)
                 # Clamp and update tqdm
                 if last_flowx != flow_x:
                     flowx_bar.n = min(max(flow_x, -flowx_bar.total), flowx_bar.total)
-                    flowx_bar.refresh()
+                    dirty_bars.add(flowx_bar)
                     last_flowx = flow_x
                 if last_flowy != flow_y:
                     flowy_bar.n = min(max(flow_y, -flowy_bar.total), flowy_bar.total)
-                    flowy_bar.refresh()
+                    dirty_bars.add(flowy_bar)
                     last_flowy = flow_y
 
+            # Redraw changed bars once the interval has passed (also on timeouts, so the last value shows)
+            now = time.monotonic()
+            if dirty_bars and now >= next_refresh:
+                for bar in dirty_bars:
+                    bar.refresh()
+                dirty_bars.clear()
+                next_refresh = now + REFRESH_INTERVAL
+
     except KeyboardInterrupt:
         print("\nProgram interrupted by user. Closing connection...")
         vehicle.close()